@@ -0,0 +1,101 @@
+"""
+Cost of tree-path attribution next to the prediction it explains.
+
+For each forest artifact: time to build the contribution tables (paid once,
+by the first explain=true request after startup), their size, predict_proba vs explain latency for one row and for a batch,
+and the largest gap between bias + contributions and predict_proba on the
+test split. With --deep-scan, also /deep_scan end to end: the first
+explain=true request, then steady state with and without explain (imports
+main, so every model file must be present):
+
+    python -m benchmarks.attribution
+    python -m benchmarks.attribution --models heart stroke --batch 256
+    python -m benchmarks.attribution --deep-scan
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from incremental_training import MODELS, base_split
+from tree_attribution import build_attribution
+
+PERCENTILES = (50, 99)
+
+
+def timed_ms(fn, repeats):
+    fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return [float(np.percentile(samples, q)) for q in PERCENTILES]
+
+
+def bench_model(name, args):
+    with open(MODELS[name]["artifact"], "rb") as f:
+        model = pickle.load(f)
+    started = time.perf_counter()
+    attribution = build_attribution(model)
+    build_seconds = time.perf_counter() - started
+    if attribution is None:
+        print(f"{name}: {type(model).__name__} has no trees; skipped")
+        return
+
+    X_test = base_split(name)[1].reindex(columns=model.feature_names_in_, fill_value=0)
+    gap = np.abs(attribution.bias + attribution.explain(X_test).sum(axis=1) - model.predict_proba(X_test)[:, 1]).max()
+    print(f"{name}: {len(attribution.trees)} trees, {len(attribution.table)} leaves, "
+          f"tables {attribution.nbytes / 1e6:.2f} MB built in {build_seconds * 1000:.0f} ms, "
+          f"max |bias + sum - prob| {gap:.1e}")
+
+    for rows in (1, args.batch):
+        X = X_test.iloc[:rows]
+        predict = timed_ms(lambda: model.predict_proba(X), args.repeats)
+        explain = timed_ms(lambda: attribution.explain_dicts(X), args.repeats)
+        print(f"  {rows:>5} row(s)  predict_proba p50 {predict[0]:7.2f}  p99 {predict[1]:7.2f} ms | "
+              f"explain p50 {explain[0]:7.2f}  p99 {explain[1]:7.2f} ms")
+
+
+def bench_deep_scan(args):
+    import main
+
+    data = main.DeepScanInput(
+        age=52, sex=1, height=172, weight=84, chest_discomfort="Mild", resting_bp=142,
+        cholesterol=238, exercise_pain=False, max_heart_rate=150, glucose=128)
+    main.attribution_cache.clear()
+    started = time.perf_counter()
+    main.deep_scan(data, explain=True)
+    print(f"/deep_scan  first explain=true request (builds the tables) {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # Interleaved, so drift (thermal, other load) hits both sides alike
+    samples = {False: [], True: []}
+    for i in range(2 * args.repeats + 2):
+        explain = bool(i % 2)
+        started = time.perf_counter()
+        main.deep_scan(data, explain=explain)
+        if i >= 2:
+            samples[explain].append((time.perf_counter() - started) * 1000)
+    plain, explained = ([float(np.percentile(samples[e], q)) for q in PERCENTILES] for e in (False, True))
+    print(f"/deep_scan  plain p50 {plain[0]:7.2f}  p99 {plain[1]:7.2f} ms | "
+          f"explain=true p50 {explained[0]:7.2f}  p99 {explained[1]:7.2f} ms "
+          f"(+{explained[0] - plain[0]:.2f} ms at p50)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--deep-scan", action="store_true", help="Also time /deep_scan with and without explain")
+    args = parser.parse_args()
+
+    for name in args.models:
+        bench_model(name, args)
+    if args.deep_scan:
+        bench_deep_scan(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Bulk onboarding throughput benchmark.
+
+Streams synthetic patients to a running backend and reports records/sec:
+
+    python -m uvicorn main:app
+    python -m benchmarks.bulk_import --rows 20000 --format ndjson --scan
+"""
+import argparse
+import http.client
+import json
+import random
+import time
+
+SCAN_FIELDS = {
+    "chest_discomfort": ["No", "Mild", "Severe"],
+}
+
+
+def synthetic_patient(i, scan):
+    row = {
+        "name": f"Bulk Patient {i}",
+        "age": random.randint(18, 90),
+        "gender": random.choice(["Male", "Female"]),
+        "height": round(random.uniform(150, 195), 1),
+        "weight": round(random.uniform(45, 120), 1),
+        "diseases": random.sample(["Diabetes", "Hypertension", "Asthma"], random.randint(0, 2)),
+    }
+    if scan:
+        row.update({
+            "chest_discomfort": random.choice(SCAN_FIELDS["chest_discomfort"]),
+            "resting_bp": random.randint(95, 180),
+            "cholesterol": random.randint(150, 300),
+            "exercise_pain": random.random() < 0.2,
+            "max_heart_rate": random.randint(100, 200),
+            "glucose": random.randint(70, 220),
+        })
+    return row
+
+
+def body_chunks(rows, fmt, scan):
+    header = None
+    for i in range(rows):
+        row = synthetic_patient(i, scan)
+        if fmt == "ndjson":
+            yield (json.dumps(row) + "\n").encode()
+            continue
+        row["diseases"] = "|".join(row["diseases"])
+        if header is None:
+            header = list(row)
+            yield (",".join(header) + "\n").encode()
+        yield (",".join(str(row[k]) for k in header) + "\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--scan", action="store_true", help="Run a deep scan per row")
+    args = parser.parse_args()
+
+    content_type = "application/x-ndjson" if args.format == "ndjson" else "text/csv"
+    path = "/api/bulk/register/patient" + ("?scan=true" if args.scan else "")
+
+    conn = http.client.HTTPConnection(args.host, args.port)
+    started = time.perf_counter()
+    conn.request(
+        "POST", path,
+        body=body_chunks(args.rows, args.format, args.scan),
+        headers={"Content-Type": content_type},
+        encode_chunked=True,
+    )
+    response = conn.getresponse()
+
+    ok = failed = 0
+    summary = None
+    for line in response:
+        msg = json.loads(line)
+        if "summary" in msg:
+            summary = msg["summary"]
+        elif msg["status"] == "success":
+            ok += 1
+        else:
+            failed += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"Rows: {args.rows} ({args.format}{', deep scan' if args.scan else ''})")
+    print(f"Inserted: {ok}  Failed: {failed}")
+    print(f"Client wall time: {elapsed:.2f}s -> {args.rows / elapsed:.0f} records/sec")
+    print("Server summary:", summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Local stand-in for the Ollama server, for load tests without a GPU or a model.
+
+Answers POST /api/chat with a canned JSON reply shaped for whichever backend
+prompt it receives (AI insight, quick scan triage, doctor matching). Every reply
+takes a fixed latency plus its token count over the token rate, and at most
+--parallel requests are generated at once (like OLLAMA_NUM_PARALLEL); the rest
+queue:
+
+    python -m benchmarks.fake_ollama --port 11435 --latency-ms 300 --tokens-per-sec 40
+    OLLAMA_HOST=http://127.0.0.1:11435 python -m uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+INSIGHT_REPLY = {
+    "twin_message": "Your numbers are stable this week; keep the evening walks going.",
+    "trajectory_explanation": "Blood pressure and glucose are flat against last month.",
+    "amplification_explanation": {"Heart Risk_Hypertension": "Raised pressure adds load on the heart."},
+    "leverage_recommendation": {"action": "Cut sodium below 2g a day", "scoreImpact": 5,
+                                "secondaryImpact": "Lower stroke risk"},
+}
+TRIAGE_REPLY = {
+    "isEmergency": False,
+    "text": "Symptoms are consistent with a mild viral infection.",
+    "conditions": ["Common cold", "Seasonal allergy", "Sinusitis"],
+    "severity": "Low",
+    "action": "Rest, fluids, and see a physician if it lasts beyond a week.",
+}
+DOCTOR_ID = re.compile(r"DID-[A-Z0-9]+")
+
+
+def reply_for(prompt):
+    if "twin_message" in prompt:
+        return INSIGHT_REPLY
+    if "isEmergency" in prompt:
+        return TRIAGE_REPLY
+    if "matches" in prompt:
+        # Rank the doctors offered in the prompt (minus the example IDs) in reverse order
+        ids = [d for d in dict.fromkeys(DOCTOR_ID.findall(prompt)) if d not in ("DID-123", "DID-456")]
+        return {"matches": ids[::-1]}
+    return {"text": "ok"}
+
+
+def create_app(latency_ms, tokens_per_sec, parallel):
+    app = FastAPI()
+    slots = asyncio.Semaphore(parallel)
+
+    @app.get("/")
+    def root():
+        return "Ollama is running"
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        content = json.dumps(reply_for(prompt))
+        # Roughly four characters per token, like most BPE vocabularies on English text
+        prompt_tokens, eval_tokens = len(prompt) // 4, max(1, len(content) // 4)
+
+        started = time.perf_counter()
+        async with slots:
+            queued = time.perf_counter() - started
+            generate = eval_tokens / tokens_per_sec if tokens_per_sec > 0 else 0.0
+            await asyncio.sleep(latency_ms / 1000.0 + generate)
+        total = time.perf_counter() - started
+
+        return {
+            "model": body.get("model", "fake"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(total * 1e9),
+            "load_duration": int(queued * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": eval_tokens,
+            "eval_duration": int(generate * 1e9),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Fixed time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40, help="Generation speed (0 = instant)")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests generated at once; the rest queue")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.tokens_per_sec, args.parallel),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+End-to-end load test: a realistic request mix at increasing concurrency.
+
+Closed-loop virtual users pick requests from a weighted mix of Deep Scan, the
+three Ollama-backed endpoints, the chat/unread polling endpoints and the
+appointment endpoints. Each concurrency level runs for a fixed time and reports
+throughput, per-endpoint latency percentiles and error rate; the level where
+throughput stops growing while latency climbs is reported as the saturation
+point.
+
+By default the backend and a fake Ollama (benchmarks/fake_ollama.py) are
+started as subprocesses, so no model is needed:
+
+    python -m benchmarks.load_test --users 1 4 16 64 --seconds 20 --out load.json
+    python -m benchmarks.load_test --llm-latency-ms 800 --tokens-per-sec 20 --compare load.json
+
+Against an already running backend (whose OLLAMA_HOST you have set up):
+
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+
+The backend keeps users, messages and the family graph in process memory, so
+it must be a single process: with several uvicorn workers each one holds its
+own shard, the seeded profiles are only found on the worker that created them,
+and the latencies are not comparable to a one-process run. The started backend
+is always one uvicorn process; point --url only at single-process servers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import httpx
+import numpy as np
+
+# Relative weights: polling dominates real traffic (NotificationBadge every 5 s, ChatBox every 3 s)
+DEFAULT_MIX = {
+    "unread_count": 30,
+    "get_messages": 20,
+    "send_message": 5,
+    "get_appointments": 10,
+    "request_appointment": 3,
+    "update_appointment": 2,
+    "deep_scan": 15,
+    "quick_scan": 5,
+    "ai_insight": 5,
+    "search_doctors": 5,
+}
+# Share of the added users that must turn into added throughput for a level to count as scaling
+# (1.0 = linear; 4x the users for +15% throughput is an efficiency of 0.05)
+SATURATION_EFFICIENCY = 0.1
+PERCENTILES = (50, 95, 99)
+
+SYMPTOMS = ["chest pain and shortness of breath", "fever and body ache for three days",
+            "migraine with dizziness", "persistent dry cough", "palpitations after exercise"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+
+def start_stack(args):
+    """Fake Ollama + backend subprocesses. Returns (base_url, [processes])."""
+    ollama_port, api_port = free_port(), free_port()
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_ollama", "--port", str(ollama_port),
+        "--latency-ms", str(args.llm_latency_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+        "--parallel", str(args.llm_parallel)])
+    env = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{ollama_port}")
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", args.app, "--port", str(api_port), "--log-level", "warning"],
+        cwd=args.app_dir, env=env)
+    wait_for(f"http://127.0.0.1:{ollama_port}/")
+    wait_for(f"http://127.0.0.1:{api_port}/metrics")
+    return f"http://127.0.0.1:{api_port}", [api, fake]
+
+
+# ----------------------------------------------------------------------
+# Request mix
+# ----------------------------------------------------------------------
+def scan_payload(rng):
+    return {
+        "age": rng.randint(20, 85), "sex": rng.randint(0, 1),
+        "height": rng.uniform(150, 195), "weight": rng.uniform(45, 120),
+        "chest_discomfort": rng.choice(["No", "Mild", "Severe"]),
+        "resting_bp": rng.randint(95, 190), "cholesterol": rng.randint(150, 320),
+        "exercise_pain": rng.random() < 0.3, "max_heart_rate": rng.randint(90, 200),
+        "glucose": rng.randint(70, 260), "pregnancies": rng.randint(0, 5),
+        "insulin": rng.randint(0, 200), "skin_thickness": rng.randint(10, 40),
+        "diabetes_pedigree": rng.uniform(0.1, 1.5),
+    }
+
+
+class Population:
+    """Registered patients / doctors and appointment IDs the mix draws from."""
+
+    def __init__(self):
+        self.patients = []
+        self.doctors = []
+        self.appointments = []
+
+    async def seed(self, client, patients, doctors, messages):
+        for i in range(doctors):
+            r = await client.post("/api/register/doctor", json={
+                "name": f"Dr. Load {i}", "specialization": "General Physician",
+                "mobile_number": "+91 9000000000", "clinic_address": "Jaipur",
+                "can_cure": ["fever", "cough"]})
+            self.doctors.append(r.json()["id"])
+        for i in range(patients):
+            r = await client.post("/api/register/patient", json={
+                "name": f"Load Patient {i}", "age": 30 + i % 50, "gender": "Female",
+                "height": 165, "weight": 62})
+            self.patients.append(r.json()["id"])
+        rng = random.Random(0)
+        for _ in range(messages):
+            await client.post("/api/messages", json={
+                "sender_id": rng.choice(self.patients), "receiver_id": rng.choice(self.doctors), "text": "hello"})
+
+
+def build_request(kind, pop, rng):
+    """(method, url, json body) for one request of the given kind."""
+    patient, doctor = rng.choice(pop.patients), rng.choice(pop.doctors)
+    if kind == "unread_count":
+        return "GET", f"/api/unread-count/{rng.choice((patient, doctor))}", None
+    if kind == "get_messages":
+        return "GET", f"/api/messages/{patient}/{doctor}?reader_id={patient}", None
+    if kind == "send_message":
+        return "POST", "/api/messages", {"sender_id": patient, "receiver_id": doctor, "text": "How are my results?"}
+    if kind == "get_appointments":
+        return "GET", f"/api/appointments/{rng.choice((patient, doctor))}", None
+    if kind == "request_appointment":
+        return "POST", "/api/appointments/request", {
+            "patient_id": patient, "doctor_id": doctor, "date": "2026-11-02", "time": "10:30",
+            "urgency": rng.choice(["Routine", "Urgent"]), "issue": "Follow-up"}
+    if kind == "update_appointment":
+        if not pop.appointments:
+            return build_request("request_appointment", pop, rng)
+        return "PUT", f"/api/appointments/{rng.choice(pop.appointments)}/status", {
+            "status": rng.choice(["Accepted", "Declined"])}
+    if kind == "deep_scan":
+        return "POST", "/deep_scan", dict(scan_payload(rng), user_id=patient)
+    if kind == "quick_scan":
+        return "POST", "/api/quick-scan", {"symptoms_text": rng.choice(SYMPTOMS)}
+    if kind == "ai_insight":
+        return "POST", "/api/ai-insight", {
+            "user_role": "Patient", "swasth_score": rng.randint(40, 95),
+            "risk_probabilities": {"heart": 0.3, "diabetes": 0.2}, "trajectory_status": "Stable",
+            "worst_metric": "Blood Pressure"}
+    if kind == "search_doctors":
+        return "POST", "/api/search-doctors", {"symptoms": rng.choice(SYMPTOMS)}
+    raise ValueError(kind)
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+async def virtual_user(client, pop, kinds, weights, deadline, samples, seed):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        method, url, body = build_request(kind, pop, rng)
+        started = time.perf_counter()
+        try:
+            r = await client.request(method, url, json=body)
+            ok = r.status_code < 400
+            if ok and kind == "request_appointment":
+                pop.appointments.append(r.json()["appointment"]["id"])
+        except httpx.HTTPError:
+            ok = False
+        samples.append((kind, time.perf_counter() - started, ok))
+
+
+def summarize(latencies_s):
+    values = np.asarray(latencies_s) * 1000
+    return {f"p{q}": round(float(np.percentile(values, q)), 2) for q in PERCENTILES}
+
+
+async def run_level(args, base_url, pop, users, mix):
+    kinds, weights = list(mix), list(mix.values())
+    samples = []
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(*[
+            virtual_user(client, pop, kinds, weights, deadline, samples, seed=users * 1000 + i)
+            for i in range(users)])
+        elapsed = time.perf_counter() - started
+
+    by_kind = {}
+    for kind, latency, ok in samples:
+        by_kind.setdefault(kind, ([], [0]))
+        by_kind[kind][0].append(latency)
+        by_kind[kind][1][0] += not ok
+    return {
+        "users": users,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "error_rate": round(sum(not ok for _, _, ok in samples) / max(1, len(samples)), 4),
+        "latency_ms": summarize([latency for _, latency, _ in samples]) if samples else None,
+        "endpoints": {
+            kind: dict(summarize(latencies), requests=len(latencies), errors=errors[0])
+            for kind, (latencies, errors) in sorted(by_kind.items())
+        },
+    }
+
+
+def saturation_point(levels):
+    """Last level before adding users stops buying throughput (see SATURATION_EFFICIENCY)."""
+    for prev, cur in zip(levels, levels[1:]):
+        users_gain = cur["users"] / prev["users"] - 1
+        throughput_gain = cur["throughput_rps"] / max(prev["throughput_rps"], 1e-9) - 1
+        if users_gain > 0 and throughput_gain / users_gain < SATURATION_EFFICIENCY:
+            return {"users": prev["users"], "throughput_rps": prev["throughput_rps"],
+                    "p95_ms": prev["latency_ms"]["p95"]}
+    return None
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+def print_level(level):
+    lat = level["latency_ms"]
+    print(f"{level['users']:>4} users | {level['throughput_rps']:8.1f} req/s | p50 {lat['p50']:8.1f}"
+          f"  p95 {lat['p95']:8.1f}  p99 {lat['p99']:8.1f} ms | errors {level['error_rate'] * 100:5.1f}%")
+    for kind, stats in level["endpoints"].items():
+        print(f"       {kind:<20} n={stats['requests']:<6} p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}"
+              f"  p99 {stats['p99']:8.1f} ms  errors {stats['errors']}")
+
+
+def compare(levels, baseline):
+    print(f"\nvs baseline ({baseline['meta'].get('timestamp', '?')}):")
+    old = {level["users"]: level for level in baseline["levels"]}
+    for level in levels:
+        prev = old.get(level["users"])
+        if not prev:
+            continue
+        rps = (level["throughput_rps"] - prev["throughput_rps"]) / prev["throughput_rps"] * 100
+        p95 = (level["latency_ms"]["p95"] - prev["latency_ms"]["p95"]) / prev["latency_ms"]["p95"] * 100
+        print(f"{level['users']:>4} users | throughput {prev['throughput_rps']:8.1f} -> {level['throughput_rps']:8.1f}"
+              f" req/s ({rps:+6.1f}%) | p95 {prev['latency_ms']['p95']:8.1f} -> {level['latency_ms']['p95']:8.1f} ms"
+              f" ({p95:+6.1f}%)")
+
+
+def parse_mix(items):
+    mix = dict(DEFAULT_MIX)
+    for item in items or []:
+        kind, _, weight = item.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown request kind {kind!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+async def run(args, base_url):
+    mix = parse_mix(args.mix)
+    pop = Population()
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        await pop.seed(client, args.patients, args.doctors, args.messages)
+
+    levels = []
+    for users in args.users:
+        level = await run_level(args, base_url, pop, users, mix)
+        print_level(level)
+        levels.append(level)
+    return mix, levels
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Use a running backend instead of starting one")
+    parser.add_argument("--app", default="main:app", help="ASGI app to start when --url is not given")
+    parser.add_argument("--app-dir", default=".", help="Working directory for the started backend (model files)")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--mix", nargs="*", metavar="KIND=WEIGHT", help="Override mix weights (0 drops a kind)")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=2000, help="Chat history seeded before the run")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    parser.add_argument("--llm-parallel", type=int, default=4)
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--compare", help="Earlier --out file to compare against")
+    args = parser.parse_args()
+
+    processes = []
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url, processes = start_stack(args)
+
+    try:
+        mix, levels = asyncio.run(run(args, base_url))
+    finally:
+        for proc in processes:
+            proc.terminate()
+            proc.wait()
+
+    saturation = saturation_point(levels)
+    if saturation:
+        print(f"\nSaturates at ~{saturation['users']} concurrent users: {saturation['throughput_rps']} req/s,"
+              f" p95 {saturation['p95_ms']} ms")
+    else:
+        print("\nNo saturation within the tested concurrency levels")
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "target": args.url or f"{args.app} (1 process)",
+            "seconds_per_level": args.seconds,
+            "fake_ollama": None if args.url else {
+                "latency_ms": args.llm_latency_ms, "tokens_per_sec": args.tokens_per_sec,
+                "parallel": args.llm_parallel},
+            "mix": mix,
+        },
+        "levels": levels,
+        "saturation": saturation,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(levels, json.load(f))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Model family benchmark and selection for the four risk models.
+
+Trains candidate families and sizes on each training CSV, with the same
+preprocessing and split as the train_*.py scripts (RandomForest at several
+tree counts and depths, HistGradientBoosting, logistic regression). Each
+candidate is scored for:
+
+- ROC AUC and expected calibration error on the test split.
+- Single-row and batch predict_proba latency, through the same DataFrame
+  path main.py uses.
+- Pickled artifact size, and the memory the model holds once unpickled.
+
+Then the tool picks a winner per disease under a single-row p99 budget and a
+memory budget:
+
+    python -m benchmarks.model_families
+    python -m benchmarks.model_families --models heart stroke --p99-ms 5 --memory-mb 20
+    python -m benchmarks.model_families --write --out model_families.json
+
+The winner is the best AUC among the candidates within budget. Candidates
+within --auc-tolerance of that AUC are broken by calibration error. --write
+replaces <model>_model.pkl with the best RandomForest within budget (a fitted
+estimator with predict_proba and feature_names_in_, as main.py expects):
+/deep_scan?explain=true and incremental_training.py updates need a forest.
+--allow-non-forest writes the overall winner instead, giving those up for
+that model.
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from incremental_training import MODELS, base_split, write_atomic
+
+PERCENTILES = (50, 95, 99)
+CALIBRATION_BINS = 10
+BATCH_ROWS = 256
+
+
+def candidates(quick=False):
+    """(name, unfitted estimator) pairs; the first one is what train_*.py ships today."""
+    out = [("rf-100", RandomForestClassifier(random_state=42))]
+    for n_trees in ((25, 50) if quick else (25, 50, 200)):
+        out.append((f"rf-{n_trees}", RandomForestClassifier(n_estimators=n_trees, random_state=42)))
+    for depth in ((8,) if quick else (6, 10, 14)):
+        out.append((f"rf-100-d{depth}", RandomForestClassifier(max_depth=depth, random_state=42)))
+    for max_iter in ((100,) if quick else (100, 300)):
+        out.append((f"hgb-{max_iter}", HistGradientBoostingClassifier(max_iter=max_iter, random_state=42)))
+    out.append(("logreg", make_pipeline(StandardScaler(), LogisticRegression(max_iter=2000))))
+    return out
+
+
+def calibration_error(y_true, prob):
+    """Expected calibration error: |mean predicted - observed rate| per probability bin, weighted by bin size."""
+    bins = np.minimum((prob * CALIBRATION_BINS).astype(int), CALIBRATION_BINS - 1)
+    error = 0.0
+    for b in range(CALIBRATION_BINS):
+        mask = bins == b
+        if mask.any():
+            error += mask.mean() * abs(prob[mask].mean() - y_true[mask].mean())
+    return float(error)
+
+
+def latency_ms(fn, inputs, repeats):
+    fn(inputs[0])
+    samples = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        samples.append((time.perf_counter() - started) * 1000)
+    return {f"p{q}": round(float(np.percentile(samples, q)), 3) for q in PERCENTILES}
+
+
+def loaded_memory_mb(blob):
+    # What unpickling allocates and keeps. Tree node arrays are allocated outside the
+    # Python allocator, so tracemalloc misses them; the pickle holds those same arrays
+    tracemalloc.start()
+    model = pickle.loads(blob)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del model
+    return max(current, len(blob)) / 1e6
+
+
+def evaluate(name, estimator, split, args):
+    X_train, X_test, y_train, y_test = split
+    started = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    prob = estimator.predict_proba(X_test)[:, 1]
+    y = y_test.to_numpy()
+    rows = [X_test.iloc[[i]] for i in range(min(len(X_test), 50))]
+    batches = [X_test.iloc[i:i + BATCH_ROWS] for i in range(0, max(1, len(X_test) - BATCH_ROWS + 1), BATCH_ROWS)][:5]
+    blob = pickle.dumps(estimator)
+    return {
+        "candidate": name,
+        "forest": isinstance(estimator, RandomForestClassifier),
+        "auc": round(float(roc_auc_score(y, prob)), 4),
+        "ece": round(calibration_error(y, prob), 4),
+        "brier": round(float(np.mean((prob - y) ** 2)), 4),
+        "single_ms": latency_ms(estimator.predict_proba, rows, args.repeats),
+        "batch_ms": latency_ms(estimator.predict_proba, batches, max(5, args.repeats // 20)),
+        "batch_rows": len(batches[0]),
+        "artifact_mb": round(len(blob) / 1e6, 3),
+        "memory_mb": round(loaded_memory_mb(blob), 3),
+        "fit_seconds": round(fit_seconds, 2),
+    }, estimator
+
+
+def select(results, args, forest_only=False):
+    """Best AUC within budget; candidates within --auc-tolerance of it are ranked by calibration error."""
+    eligible = [r for r in results
+                if r["single_ms"]["p99"] <= args.p99_ms and r["memory_mb"] <= args.memory_mb
+                and (r["forest"] or not forest_only)]
+    if not eligible:
+        return None
+    best_auc = max(r["auc"] for r in eligible)
+    close = [r for r in eligible if r["auc"] >= best_auc - args.auc_tolerance]
+    return min(close, key=lambda r: (r["ece"], r["single_ms"]["p99"]))
+
+
+def print_table(model_name, results, winner):
+    print(f"\n{model_name}")
+    print(f"  {'candidate':<12} {'AUC':>6} {'ECE':>6} {'1-row p50':>10} {'p99':>8} "
+          f"{'batch p50':>10} {'size MB':>8} {'mem MB':>8} {'fit s':>7}")
+    for r in results:
+        mark = "*" if winner and r["candidate"] == winner["candidate"] else " "
+        print(f"{mark} {r['candidate']:<12} {r['auc']:6.4f} {r['ece']:6.4f} {r['single_ms']['p50']:10.2f} "
+              f"{r['single_ms']['p99']:8.2f} {r['batch_ms']['p50']:10.2f} {r['artifact_mb']:8.2f} "
+              f"{r['memory_mb']:8.2f} {r['fit_seconds']:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--p99-ms", type=float, default=25.0, help="Single-row predict_proba p99 budget")
+    parser.add_argument("--memory-mb", type=float, default=50.0, help="Loaded model memory budget")
+    parser.add_argument("--auc-tolerance", type=float, default=0.005,
+                        help="AUC gap within which better calibration wins")
+    parser.add_argument("--repeats", type=int, default=200, help="Timed single-row predictions per candidate")
+    parser.add_argument("--quick", action="store_true", help="Fewer candidates")
+    parser.add_argument("--write", action="store_true",
+                        help="Replace <model>_model.pkl with the best forest within budget")
+    parser.add_argument("--allow-non-forest", action="store_true",
+                        help="With --write, publish the overall winner even if it is not a forest "
+                             "(disables explain attributions and incremental updates for that model)")
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "sklearn": sklearn.__version__,
+            "p99_ms": args.p99_ms,
+            "memory_mb": args.memory_mb,
+        },
+        "models": {},
+    }
+    for model_name in args.models:
+        split = base_split(model_name)
+        print(f"{model_name}: {len(split[0])} training rows, {len(split[1])} test rows", flush=True)
+        results, fitted = [], {}
+        for name, estimator in candidates(args.quick):
+            result, fitted[name] = evaluate(name, estimator, split, args)
+            results.append(result)
+        winner = select(results, args)
+        print_table(model_name, results, winner)
+        publish = winner if args.allow_non_forest else select(results, args, forest_only=True)
+        report["models"][model_name] = {"results": results, "winner": winner and winner["candidate"],
+                                        "published": publish and args.write and publish["candidate"]}
+
+        if winner is None:
+            print("  No candidate fits the budget; artifact left as is")
+            continue
+        print(f"  Winner: {winner['candidate']}")
+        if not args.write:
+            continue
+        if publish is None:
+            print("  No forest fits the budget; artifact left as is (--allow-non-forest to publish the winner)")
+            continue
+        if publish is not winner:
+            print(f"  Publishing the best forest, {publish['candidate']}: explain and incremental updates need one")
+        elif not publish["forest"]:
+            print(f"  WARNING: {publish['candidate']} is not a forest; /deep_scan?explain=true and"
+                  f" incremental_training.py updates will refuse {model_name}")
+        artifact = MODELS[model_name]["artifact"]
+        write_atomic(artifact, pickle.dumps(fitted[publish["candidate"]]))
+        print(f"  Wrote {artifact}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Doctor panel risk latency benchmark (in-process, run from the repo root):
+
+    python -m benchmarks.panel_risk --patients 5000
+"""
+import argparse
+import random
+import time
+
+import main
+
+
+def build_panel(n_patients):
+    doctor = main.register_doctor(main.DoctorRegistration(
+        name="Dr. Bench", specialization="Cardiologist",
+        mobile_number="0", clinic_address="Bench"))
+    did = doctor["id"]
+
+    for i in range(n_patients):
+        patient = main.register_patient(main.PatientRegistration(
+            name=f"Panel Patient {i}",
+            age=random.randint(20, 90),
+            gender=random.choice(["Male", "Female"]),
+            height=random.uniform(150, 195),
+            weight=random.uniform(45, 120),
+            blood_pressure=f"{random.randint(100, 180)}/80"))
+        pid = patient["id"]
+        main.db_connections.setdefault(did, []).append(pid)
+        main.db_permissions.setdefault(pid, []).append(did)
+    return did
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    out = fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{label:<28} {elapsed:9.1f} ms  (recomputed {out['recomputed']} / {out['patients_scored']})")
+    return out
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--changed", type=int, default=50, help="Patients whose vitals change between calls")
+    args = parser.parse_args()
+
+    random.seed(42)
+    did = build_panel(args.patients)
+
+    timed("cold (all patients)", lambda: main.get_panel_risk(did))
+    timed("warm (nothing changed)", lambda: main.get_panel_risk(did))
+
+    for pid in main.db_connections[did][:args.changed]:
+        main.db_patients[pid]["weight"] += 5
+    timed(f"warm ({args.changed} changed)", lambda: main.get_panel_risk(did))
+
+    main.MODEL_VERSION += "+bench"
+    timed("model version bumped", lambda: main.get_panel_risk(did))
+
+
+if __name__ == "__main__":
+    main_()
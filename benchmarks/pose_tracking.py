@@ -0,0 +1,100 @@
+"""
+Per-frame pose latency: the old full-resolution IMAGE-mode path against
+PoseTracker (VIDEO mode, downscaled, ROI-cropped). Needs pose_landmarker.task
+and ideally a recorded clip of someone facing the camera:
+
+    python -m benchmarks.pose_tracking --video scan.mp4
+"""
+import argparse
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+import vision_scan
+from vision_scan import LEFT_SHOULDER, RIGHT_SHOULDER, PoseTracker
+
+
+def create_image_detector():
+    options = vision.PoseLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=vision_scan.POSE_MODEL_PATH),
+        output_segmentation_masks=False)
+    return vision.PoseLandmarker.create_from_options(options)
+
+
+def image_mode_shoulders(detector, frame):
+    # Today's path before the tracker: full-res cvtColor + IMAGE-mode detect
+    h, w = frame.shape[:2]
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    result = detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame))
+    if not result.pose_landmarks:
+        return None
+    l_sh = result.pose_landmarks[0][LEFT_SHOULDER]
+    r_sh = result.pose_landmarks[0][RIGHT_SHOULDER]
+    return (l_sh.x * w, l_sh.y * h), (r_sh.x * w, r_sh.y * h)
+
+
+def read_frames(path, limit, resize):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if resize:
+            frame = cv2.resize(frame, resize)
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def timed(fn, frames):
+    out, times = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        out.append(fn(frame))
+        times.append((time.perf_counter() - started) * 1000)
+    return out, np.array(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="1920x1080", help="Resize frames to WxH before timing")
+    parser.add_argument("--model", default=vision_scan.POSE_MODEL_PATH)
+    args = parser.parse_args()
+
+    vision_scan.POSE_MODEL_PATH = args.model
+    frames = read_frames(args.video, args.frames, tuple(map(int, args.size.split("x"))))
+    print(f"{len(frames)} frames at {args.size}")
+
+    detector = create_image_detector()
+    baseline, base_ms = timed(lambda f: image_mode_shoulders(detector, f), frames)
+
+    tracker = PoseTracker(vision_scan.create_detector())
+    locked = []
+
+    def tracked(frame):
+        locked.append(tracker.roi is not None)
+        return tracker.locate_shoulders(frame)
+
+    tracked_out, track_ms = timed(tracked, frames)
+
+    for label, ms in (("IMAGE mode, full-res", base_ms), ("PoseTracker", track_ms)):
+        print(f"{label:<22} p50 {np.percentile(ms, 50):6.1f} ms  p95 {np.percentile(ms, 95):6.1f} ms  mean {ms.mean():6.1f} ms")
+    print(f"Per-frame gain: {base_ms.mean() / track_ms.mean():.2f}x, ROI locked on {np.mean(locked) * 100:.0f}% of frames")
+
+    errors = [
+        np.hypot(*np.subtract(a[i], b[i]))
+        for a, b in zip(baseline, tracked_out) if a and b for i in (0, 1)
+    ]
+    if errors:
+        print(f"Shoulder position difference vs full-res: mean {np.mean(errors):.1f}px, p95 {np.percentile(errors, 95):.1f}px")
+
+
+if __name__ == "__main__":
+    main()
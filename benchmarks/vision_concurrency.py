@@ -0,0 +1,147 @@
+"""
+Aggregate /ws/vision-scan throughput with N concurrent scanners.
+
+Each scanner runs closed-loop (send a frame, wait for the reply) against a
+running backend while a side probe times GET / to show whether the event loop
+stays responsive:
+
+    python -m uvicorn main:app
+    python -m benchmarks.vision_concurrency --clients 1 4 16 --seconds 10
+    python -m benchmarks.vision_concurrency --clients 16 --pacing
+
+With --pacing the scanners connect with ?pacing=1 and follow the server's
+fps / max_side / JPEG quality hints instead of sending flat out.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+import websockets
+
+from vision_scan import FRAME_HEADER, PACING_LADDER, PROTOCOL_VERSION
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+
+def synthetic_jpeg(width, height, quality=60):
+    # Smooth gradient plus noise so the JPEG size is in the range of a real webcam frame
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))])
+    frame += np.random.default_rng(0).normal(0, 12, frame.shape)
+    _, buf = cv2.imencode('.jpg', np.clip(frame, 0, 255).astype(np.uint8), [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return buf.tobytes()
+
+
+def frame_message(jpeg, seq, use_json):
+    if use_json:
+        return json.dumps({"frame": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode(), "phase": 1})
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, 1, 0, seq) + jpeg
+
+
+async def scanner(url, jpeg, deadline, use_json, latencies):
+    frames = 0
+    async with websockets.connect(url, max_size=None) as ws:
+        seq = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await ws.send(frame_message(jpeg, seq, use_json))
+            await ws.recv()
+            latencies.append(time.perf_counter() - started)
+            frames += 1
+            seq += 1
+    return frames
+
+
+async def paced_scanner(url, jpegs, deadline, latencies, settings_seen):
+    frames = 0
+    async with websockets.connect(url + "?pacing=1", max_size=None) as ws:
+        settings = json.loads(await ws.recv())
+        seq = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            jpeg = jpegs[(settings["max_side"], settings["jpeg_quality"])]
+            await ws.send(FRAME_HEADER.pack(PROTOCOL_VERSION, 1, 0, seq) + jpeg)
+            # Wait for this frame's ack (its reply, or a dropped-frame ack); apply hint updates on the way
+            while True:
+                msg = await ws.recv()
+                if isinstance(msg, bytes):
+                    break
+                msg = json.loads(msg)
+                if msg.get("type") == "pacing":
+                    settings = msg
+                    settings_seen.append((msg["fps"], msg["max_side"]))
+                elif msg.get("type") == "ack":
+                    break
+            latencies.append(time.perf_counter() - started)
+            frames += 1
+            seq += 1
+            await asyncio.sleep(max(0.0, 1.0 / settings["fps"] - (time.perf_counter() - started)))
+    return frames
+
+
+async def probe(http_url, deadline, samples):
+    loop = asyncio.get_running_loop()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await loop.run_in_executor(None, lambda: urllib.request.urlopen(http_url).read())
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+def pct(values, q):
+    return np.percentile(values, q) * 1000 if values else float("nan")
+
+
+async def run(args, clients, jpeg):
+    url = f"ws://{args.host}:{args.port}/ws/vision-scan"
+    latencies, probes, settings_seen = [], [], []
+    deadline = time.perf_counter() + args.seconds
+    started = time.perf_counter()
+    if args.pacing:
+        scanners = [paced_scanner(url, jpeg, deadline, latencies, settings_seen) for _ in range(clients)]
+    else:
+        scanners = [scanner(url, jpeg, deadline, args.json, latencies) for _ in range(clients)]
+    results = await asyncio.gather(probe(f"http://{args.host}:{args.port}/", deadline, probes), *scanners)
+    elapsed = time.perf_counter() - started
+    frames = sum(results[1:])
+    print(f"{clients:>3} scanners | {frames / elapsed:7.1f} fps total | {frames / elapsed / clients:6.1f} fps/scanner"
+          f" | frame p50 {pct(latencies, 50):6.1f} ms p95 {pct(latencies, 95):6.1f} ms"
+          f" | GET / p50 {pct(probes, 50):5.1f} ms p99 {pct(probes, 99):6.1f} ms")
+    if settings_seen:
+        fps, max_side = settings_seen[-1]
+        print(f"    last pacing hint: {fps} fps, max side {max_side}px ({len(settings_seen)} updates)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="720p")
+    parser.add_argument("--json", action="store_true", help="Use the legacy JSON/base64 protocol")
+    parser.add_argument("--pacing", action="store_true", help="Follow server pacing hints (binary protocol)")
+    args = parser.parse_args()
+
+    if args.pacing:
+        # One pre-encoded 16:9 frame per rung of the server's ladder
+        jpeg = {
+            (side, quality): synthetic_jpeg(side, side * 9 // 16, int(quality * 100))
+            for side, quality in PACING_LADDER
+        }
+        print("paced binary protocol, frames follow the server's resolution ladder")
+    else:
+        jpeg = synthetic_jpeg(*RESOLUTIONS[args.resolution])
+        print(f"{args.resolution} frames, {len(jpeg) / 1024:.0f} KiB JPEG, {'json' if args.json else 'binary'} protocol")
+    for clients in args.clients:
+        asyncio.run(run(args, clients, jpeg))
+
+
+if __name__ == "__main__":
+    main()
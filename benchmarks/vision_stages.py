@@ -0,0 +1,234 @@
+"""
+Where the time goes in one /ws/vision-scan frame, per pipeline stage.
+
+Frames (synthetic, or taken from a recorded clip with --video) are pushed at
+480p / 720p / 1080p through ScanSession.process_message with a StageClock, in
+both wire protocols, and then end to end over a real WebSocket against an
+embedded uvicorn server:
+
+    python -m benchmarks.vision_stages
+    python -m benchmarks.vision_stages --video scan.mp4 --out baseline.json
+    python -m benchmarks.vision_stages --compare baseline.json
+
+Without pose_landmarker.task, --stub-detector MS swaps the PoseLandmarker for
+a fixed-pose stub that sleeps MS per frame, so every other stage can still be
+measured. Results are written as JSON (--out) and --compare prints the p50
+change of every stage against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+import vision_scan
+from benchmarks.vision_concurrency import RESOLUTIONS, frame_message, synthetic_jpeg
+from vision_scan import FRAME_STAGES, LEFT_SHOULDER, RIGHT_SHOULDER, PoseTracker, ScanSession, StageClock
+
+PERCENTILES = (50, 95, 99)
+
+
+class StubDetector:
+    # Stands in for PoseLandmarker: a fixed frontal pose after a fixed delay
+    def __init__(self, delay_ms):
+        self.delay = delay_ms / 1000.0
+        landmark = SimpleNamespace(x=0.5, y=0.5, presence=1.0)
+        self.landmarks = [landmark] * 33
+        self.landmarks[LEFT_SHOULDER] = SimpleNamespace(x=0.62, y=0.45, presence=1.0)
+        self.landmarks[RIGHT_SHOULDER] = SimpleNamespace(x=0.38, y=0.45, presence=1.0)
+
+    def detect_for_video(self, image, timestamp_ms):
+        time.sleep(self.delay)
+        return SimpleNamespace(pose_landmarks=[self.landmarks])
+
+
+def make_tracker(args):
+    if args.stub_detector is not None:
+        return PoseTracker(StubDetector(args.stub_detector))
+    return vision_scan.create_tracker()
+
+
+def load_frames(args, size):
+    """JPEG bytes for one resolution: the clip's frames resized, or one synthetic frame."""
+    if not args.video:
+        return [synthetic_jpeg(*size)]
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        _, buf = cv2.imencode('.jpg', cv2.resize(frame, size), [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+        frames.append(buf.tobytes())
+    cap.release()
+    if not frames:
+        raise SystemExit(f"Could not read frames from {args.video}")
+    return frames
+
+
+def summarize(samples_ms):
+    values = np.asarray(samples_ms)
+    return {f"p{q}": round(float(np.percentile(values, q)), 3) for q in PERCENTILES}
+
+
+# ----------------------------------------------------------------------
+# In-process: the handler logic, stage by stage
+# ----------------------------------------------------------------------
+def run_in_process(args, jpegs, use_json):
+    session = ScanSession(make_tracker(args))
+    stages = {}
+    totals = []
+
+    for i in range(args.warmup + args.frames):
+        data = frame_message(jpegs[i % len(jpegs)], i, use_json)
+        started = time.perf_counter()
+        clock = StageClock()
+        reply = session.process_message(data, clock=clock)
+        if use_json:
+            # What send_result does on the event loop
+            json.dumps(reply, separators=(",", ":"), ensure_ascii=False)
+            clock.lap("json_dumps")
+        total = time.perf_counter() - started
+        if i < args.warmup:
+            continue
+        totals.append(total * 1000)
+        for stage, seconds in clock.stages.items():
+            stages.setdefault(stage, []).append(seconds * 1000)
+
+    return {
+        "stages": {stage: summarize(stages[stage]) for stage in FRAME_STAGES if stage in stages},
+        "total": summarize(totals),
+        "fps": round(1000.0 / float(np.mean(totals)), 1),
+    }
+
+
+# ----------------------------------------------------------------------
+# End to end over a local WebSocket
+# ----------------------------------------------------------------------
+def start_server(args):
+    import uvicorn
+    import main as backend
+
+    if args.stub_detector is not None:
+        backend.detector_pool.factory = lambda: make_tracker(args)
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(backend.app, port=port, log_level="warning", ws_max_size=64 * 1024 * 1024))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"ws://127.0.0.1:{port}/ws/vision-scan"
+
+
+async def run_over_websocket(args, url, jpegs, use_json):
+    import websockets
+
+    latencies = []
+    async with websockets.connect(url, max_size=None) as ws:
+        started_all = None
+        for i in range(args.warmup + args.frames):
+            if i == args.warmup:
+                started_all = time.perf_counter()
+            started = time.perf_counter()
+            await ws.send(frame_message(jpegs[i % len(jpegs)], i, use_json))
+            await ws.recv()
+            if i >= args.warmup:
+                latencies.append((time.perf_counter() - started) * 1000)
+        elapsed = time.perf_counter() - started_all
+    return {"total": summarize(latencies), "fps": round(args.frames / elapsed, 1)}
+
+
+# ----------------------------------------------------------------------
+# Reporting
+# ----------------------------------------------------------------------
+def print_run(label, result):
+    total = result["total"]
+    print(f"  {label:<14} {result['fps']:6.1f} fps | total p50 {total['p50']:7.2f}  p95 {total['p95']:7.2f}"
+          f"  p99 {total['p99']:7.2f} ms")
+    for stage, pcts in result.get("stages", {}).items():
+        print(f"      {stage:<12} p50 {pcts['p50']:7.3f}  p95 {pcts['p95']:7.3f}  p99 {pcts['p99']:7.3f} ms")
+
+
+def compare(results, baseline):
+    print(f"\nChange in p50 vs baseline ({baseline['meta'].get('timestamp', '?')}):")
+    for res, runs in results["runs"].items():
+        for label, result in runs.items():
+            old = baseline["runs"].get(res, {}).get(label)
+            if not old:
+                continue
+            rows = [("total", result["total"], old["total"])]
+            rows += [(stage, pcts, old.get("stages", {}).get(stage)) for stage, pcts in result.get("stages", {}).items()]
+            for stage, new, prev in rows:
+                if not prev or not prev["p50"]:
+                    continue
+                delta = (new["p50"] - prev["p50"]) / prev["p50"] * 100
+                print(f"  {res:<6} {label:<14} {stage:<12} {prev['p50']:8.3f} -> {new['p50']:8.3f} ms ({delta:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--video", help="Recorded clip to take frames from instead of a synthetic frame")
+    parser.add_argument("--model", default=vision_scan.POSE_MODEL_PATH)
+    parser.add_argument("--stub-detector", type=float, metavar="MS",
+                        help="Replace PoseLandmarker with a fixed-pose stub that takes MS per frame")
+    parser.add_argument("--no-ws", action="store_true", help="Skip the end-to-end WebSocket runs")
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--compare", help="Earlier --out file to compare against")
+    args = parser.parse_args()
+
+    vision_scan.POSE_MODEL_PATH = args.model
+    if args.stub_detector is None and not os.path.exists(args.model):
+        raise SystemExit(f"{args.model} not found: pass --model, or --stub-detector MS to time the other stages")
+
+    server, url = (None, None) if args.no_ws else start_server(args)
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "frames": args.frames,
+            "source": args.video or "synthetic",
+            "detector": "stub %.1f ms" % args.stub_detector if args.stub_detector is not None else args.model,
+        },
+        "runs": {},
+    }
+
+    for res in args.resolutions:
+        jpegs = load_frames(args, RESOLUTIONS[res])
+        print(f"{res}: {len(jpegs)} distinct frame(s), {np.mean([len(j) for j in jpegs]) / 1024:.0f} KiB JPEG")
+        runs = results["runs"][res] = {}
+        for use_json in (True, False):
+            protocol = "json" if use_json else "binary"
+            runs[protocol] = run_in_process(args, jpegs, use_json)
+            print_run(protocol, runs[protocol])
+            if url:
+                runs[f"{protocol}_ws"] = asyncio.run(run_over_websocket(args, url, jpegs, use_json))
+                print_run(f"{protocol} over ws", runs[f"{protocol}_ws"])
+
+    if server:
+        server.should_exit = True
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
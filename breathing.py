@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+
+# Uniform resampling rate for the spectral estimate (frames arrive at whatever rate the client manages)
+SAMPLE_HZ = 4.0
+WINDOW_SECONDS = 30.0
+MIN_SECONDS = 10.0          # no rate is reported before this much signal
+BREATH_BAND_HZ = (0.1, 0.7)  # 6 - 42 breaths per minute
+SMOOTHING_ALPHA = 0.3        # display EMA on the raw shoulder distance
+TREND_SECONDS = 8.0          # slow EMA removed before the DFT (high-pass well below the band)
+MAX_GAP_SECONDS = 2.0        # longer tracking gaps restart the analysis
+RAW_CAPACITY = 1024          # timestamped raw samples kept for time series
+
+
+class BreathingAnalyzer:
+    """
+    Breathing rate / depth from a stream of (timestamp, shoulder distance) samples.
+
+    All buffers are allocated once. Each sample is appended to a raw ring, resampled
+    onto a uniform SAMPLE_HZ grid, high-passed against a slow EMA, and pushed into a
+    sliding DFT that only tracks the bins of the breathing band, so the per-frame
+    cost is O(band bins) regardless of session length. Every full window the
+    spectrum is re-projected exactly to cancel floating point drift.
+    """
+
+    def __init__(self):
+        self.n = int(WINDOW_SECONDS * SAMPLE_HZ)
+        self.dt = 1.0 / SAMPLE_HZ
+
+        k = np.arange(math.ceil(BREATH_BAND_HZ[0] * WINDOW_SECONDS),
+                      math.floor(BREATH_BAND_HZ[1] * WINDOW_SECONDS) + 1)
+        self.freqs = k / WINDOW_SECONDS
+        self.twiddle = np.exp(2j * np.pi * k / self.n)
+        self.basis = np.exp(-2j * np.pi * np.outer(k, np.arange(self.n)) / self.n)
+
+        self.window = np.zeros(self.n)
+        self.spectrum = np.zeros(len(k), dtype=complex)
+        self._power = np.zeros(len(k))
+
+        self.raw_t = np.zeros(RAW_CAPACITY)
+        self.raw_v = np.zeros(RAW_CAPACITY)
+
+        self.trend_alpha = 1.0 / (TREND_SECONDS * SAMPLE_HZ)
+        self.reset()
+
+    def reset(self):
+        self.window.fill(0.0)
+        self.spectrum.fill(0.0)
+        self.raw_count = 0
+        self.uniform_count = 0
+        self.pos = 0
+        self.smoothed = None
+        self.trend = None
+        self.last_t = None
+        self.last_v = None
+        self.next_t = None
+
+    # -----------------------
+    # Ingest
+    # -----------------------
+    def add(self, t, value):
+        if self.last_t is not None:
+            if t - self.last_t > MAX_GAP_SECONDS:
+                self.reset()
+            elif t <= self.last_t:
+                return  # out of order / duplicate timestamp
+
+        slot = self.raw_count % RAW_CAPACITY
+        self.raw_t[slot] = t
+        self.raw_v[slot] = value
+        self.raw_count += 1
+
+        if self.smoothed is None:
+            self.smoothed = value
+            self.trend = value
+            self.next_t = t
+        else:
+            self.smoothed += SMOOTHING_ALPHA * (value - self.smoothed)
+
+        # Linear interpolation onto the uniform grid between the previous and this sample
+        if self.last_t is None:
+            self._push(value)
+            self.next_t += self.dt
+        else:
+            span = t - self.last_t
+            while self.next_t <= t:
+                frac = (self.next_t - self.last_t) / span
+                self._push(self.last_v + frac * (value - self.last_v))
+                self.next_t += self.dt
+
+        self.last_t = t
+        self.last_v = value
+
+    def _push(self, value):
+        self.trend += self.trend_alpha * (value - self.trend)
+        x_new = value - self.trend
+        x_old = self.window[self.pos]
+        self.window[self.pos] = x_new
+        self.pos = (self.pos + 1) % self.n
+        self.uniform_count += 1
+
+        # Sliding DFT step, in place: X_k <- e^(2*pi*i*k/N) * (X_k - x_old + x_new)
+        self.spectrum += x_new - x_old
+        self.spectrum *= self.twiddle
+
+        if self.pos == 0:
+            # Exact re-projection once per window; the ring starts at index 0 here
+            np.dot(self.basis, self.window, out=self.spectrum)
+
+    # -----------------------
+    # Metrics
+    # -----------------------
+    def metrics(self):
+        out = {
+            "smoothed_dist": None if self.smoothed is None else round(float(self.smoothed), 1),
+            "breaths_per_min": None,
+            "expansion_px": None,
+            "expansion_pct": None,
+            "confidence": None,
+            "window_seconds": round(min(self.uniform_count, self.n) * self.dt, 1),
+        }
+        if self.uniform_count * self.dt < MIN_SECONDS:
+            return out
+
+        np.abs(self.spectrum, out=self._power)
+        np.square(self._power, out=self._power)
+        peak = int(np.argmax(self._power))
+        total = self._power.sum()
+        if total <= 0:
+            return out
+
+        # Off-bin rates spread over the neighbouring bins; take their energy together
+        lo, hi = max(peak - 1, 0), min(peak + 2, len(self._power))
+        peak_power = self._power[lo:hi].sum()
+        magnitude = math.sqrt(peak_power)
+
+        # Parabolic interpolation between neighbouring bins for sub-bin resolution
+        offset = 0.0
+        if 0 < peak < len(self._power) - 1:
+            a, b, c = np.sqrt(self._power[peak - 1:peak + 2])
+            denom = a - 2 * b + c
+            if denom != 0:
+                offset = 0.5 * (a - c) / denom
+        freq = self.freqs[peak] + offset / WINDOW_SECONDS
+
+        # |X_k| = A * n / 2 for a sinusoid of amplitude A; peak-to-peak expansion is 2A
+        n_eff = min(self.uniform_count, self.n)
+        expansion = 4.0 * magnitude / n_eff
+
+        out["breaths_per_min"] = round(float(freq * 60.0), 1)
+        out["expansion_px"] = round(float(expansion), 2)
+        out["expansion_pct"] = round(float(expansion / self.trend * 100.0), 2) if self.trend else None
+        out["confidence"] = round(float(peak_power / total), 2)
+        return out
+
+    def series(self):
+        """Raw (timestamps, distances) still held in the ring, oldest first."""
+        count = min(self.raw_count, RAW_CAPACITY)
+        start = self.raw_count - count
+        idx = np.arange(start, self.raw_count) % RAW_CAPACITY
+        return self.raw_t[idx], self.raw_v[idx]
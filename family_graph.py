@@ -0,0 +1,201 @@
+import heapq
+from collections import Counter, deque
+
+# Hard ceiling on how far a family query may walk, whatever the client asks for
+MAX_FAMILY_DEPTH = 6
+
+# Placeholder shown for relatives who have never run a Deep Scan
+DEFAULT_SWASTH_SCORE = 85
+
+# A family's score heap is rebuilt once superseded entries make it this many times its live size
+SCORE_HEAP_COMPACT_RATIO = 4
+
+
+class FamilyGraph:
+    """
+    Unified ID -> entity index plus the family link graph.
+
+    Families are the connected components of the link graph. They are tracked
+    with a union-find so every family carries running aggregates (member count,
+    score sum, worst score, hereditary condition counts) that are patched in
+    place when a link is added or a member's score changes.
+    """
+
+    def __init__(self):
+        self.entities = {}   # ID -> {"role": "Patient", "record": {...}}
+        self.links = {}      # ID -> {relative_id: None} (ordered set)
+
+        # Union-find state
+        self._parent = {}
+        self._size = {}
+
+        # Per-family aggregates, keyed by the union-find root
+        self._families = {}
+
+        # Per-member inputs to the aggregates
+        self._scores = {}
+        self._conditions = {}
+        self._scan_conditions = {}  # From the latest Deep Scan, kept apart from registered diseases
+
+    # -----------------------
+    # Entity Index
+    # -----------------------
+    def register_entity(self, entity_id, role, record):
+        self.entities[entity_id] = {"role": role, "record": record}
+        if entity_id not in self._parent:
+            self._parent[entity_id] = entity_id
+            self._size[entity_id] = 1
+            self._families[entity_id] = {
+                "members": 1,
+                "scored": 0,
+                "score_sum": 0.0,
+                "score_heap": [],
+                "conditions": Counter(),
+            }
+        # Re-registering replaces the declared diseases but keeps what scans found
+        self._set_conditions(entity_id, list(record.get("diseases", [])) + self._scan_conditions.get(entity_id, []))
+
+    def get_entity(self, entity_id):
+        return self.entities.get(entity_id)
+
+    # -----------------------
+    # Links
+    # -----------------------
+    def has_link(self, user_id, relative_id):
+        return relative_id in self.links.get(user_id, {})
+
+    def add_link(self, user_id, relative_id):
+        # Both ends must be registered: a placeholder entity would pass later existence checks
+        for entity_id in (user_id, relative_id):
+            if entity_id not in self._parent:
+                raise KeyError(entity_id)
+
+        # Bi-directional link
+        self.links.setdefault(user_id, {})[relative_id] = None
+        self.links.setdefault(relative_id, {})[user_id] = None
+        self._union(user_id, relative_id)
+
+    def relatives(self, user_id):
+        return list(self.links.get(user_id, {}))
+
+    def traverse(self, user_id, max_depth=1):
+        """BFS out to max_depth hops. Returns [(relative_id, degree), ...] without the start node."""
+        if not 1 <= max_depth <= MAX_FAMILY_DEPTH:
+            raise ValueError(f"max_depth must be between 1 and {MAX_FAMILY_DEPTH}")
+        visited = {user_id}
+        found = []
+        queue = deque([(user_id, 0)])
+
+        while queue:
+            node, depth = queue.popleft()
+            if depth == max_depth:
+                continue
+            for rel_id in self.links.get(node, {}):
+                # Cycles (e.g. both parents linked to each other and the child) stop here
+                if rel_id in visited:
+                    continue
+                visited.add(rel_id)
+                found.append((rel_id, depth + 1))
+                queue.append((rel_id, depth + 1))
+
+        return found
+
+    # -----------------------
+    # Health Metrics
+    # -----------------------
+    def update_health(self, entity_id, swasth_score, conditions=None):
+        if entity_id not in self._parent:
+            return
+        family = self._families[self._find(entity_id)]
+
+        old_score = self._scores.get(entity_id)
+        if old_score is None:
+            family["scored"] += 1
+        else:
+            family["score_sum"] -= old_score
+        self._scores[entity_id] = swasth_score
+        family["score_sum"] += swasth_score
+        heap = family["score_heap"]
+        heapq.heappush(heap, (swasth_score, entity_id))
+        # Superseded entries are otherwise only dropped when they reach the top
+        if len(heap) > SCORE_HEAP_COMPACT_RATIO * max(family["scored"], 1):
+            family["score_heap"] = [(s, eid) for s, eid in set(heap) if self._scores.get(eid) == s]
+            heapq.heapify(family["score_heap"])
+
+        if conditions is not None:
+            self._scan_conditions[entity_id] = list(conditions)
+            record = self.entities[entity_id]["record"]
+            self._set_conditions(entity_id, list(record.get("diseases", [])) + list(conditions))
+
+    def score_of(self, entity_id):
+        return self._scores.get(entity_id)
+
+    def family_metrics(self, entity_id):
+        if entity_id not in self._parent:
+            return None
+        family = self._families[self._find(entity_id)]
+
+        worst = None
+        heap = family["score_heap"]
+        # Lazily drop heap entries that were superseded by a newer score
+        while heap and self._scores.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        if heap:
+            worst = {"id": heap[0][1], "swasth_score": heap[0][0]}
+
+        mean = None
+        if family["scored"]:
+            mean = round(family["score_sum"] / family["scored"], 1)
+
+        return {
+            "members": family["members"],
+            "scored_members": family["scored"],
+            "mean_swasth_score": mean,
+            "worst": worst,
+            "hereditary_risks": dict(family["conditions"].most_common()),
+        }
+
+    # -----------------------
+    # Internals
+    # -----------------------
+    def _find(self, entity_id):
+        root = entity_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Path compression
+        while self._parent[entity_id] != root:
+            self._parent[entity_id], entity_id = root, self._parent[entity_id]
+        return root
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+
+        # Fold the smaller family's aggregates into the larger one
+        big, small = self._families[root_a], self._families.pop(root_b)
+        big["members"] += small["members"]
+        big["scored"] += small["scored"]
+        big["score_sum"] += small["score_sum"]
+        big["conditions"].update(small["conditions"])
+        for entry in small["score_heap"]:
+            heapq.heappush(big["score_heap"], entry)
+
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size.pop(root_b)
+
+    def _set_conditions(self, entity_id, conditions):
+        new = {c.strip().lower() for c in conditions if c and c.strip()}
+        old = self._conditions.get(entity_id, set())
+        if new == old:
+            return
+
+        counts = self._families[self._find(entity_id)]["conditions"]
+        counts.subtract(old - new)
+        counts.update(new - old)
+        for condition in old - new:
+            if counts[condition] <= 0:
+                del counts[condition]
+        self._conditions[entity_id] = new
@@ -22,7 +22,7 @@ import TwinCompanionChat from '../components/TwinLab/TwinCompanionChat';
 import FamilyWebTree from '../components/Family/FamilyWebTree';
 
 // Import API Service
-import { getAIInsights } from '../services/apiService';
+import { getAIInsights, getWhatIf } from '../services/apiService';
 
 const CircularProgress = ({ value, color, size = 120, initials, bioAge }) => {
 // ... existing circular progress code
@@ -111,6 +111,14 @@ const DashboardPage = () => {
   const [aiData, setAiData] = useState(null);
   const [isLoadingAI, setIsLoadingAI] = useState(true);
 
+  // What-if sweep over the ML models (needs a Deep Scan stored against this user)
+  const [whatIf, setWhatIf] = useState(null);
+
+  useEffect(() => {
+    if (!scanResults || !user?.id) return;
+    getWhatIf(user.id).then(setWhatIf);
+  }, [user, scanResults]);
+
   // Fetch AI Insights on mount (or when core metrics change)
   useEffect(() => {
     const fetchInsights = async () => {
@@ -183,7 +191,14 @@ const DashboardPage = () => {
       chronologicalAge: user?.age || 30, // Fallback to 30 if age wasn't provided
       biologicalAge: scanResults ? (user?.age || 30) + (100 - swasthScore > 30 ? 4 : 0) : (user?.age || 30)
     },
-    projection: {
+    projection: whatIf ? {
+      current: swasthScore,
+      base6m: swasthScore - 4, 
+      base12m: swasthScore - 10,
+      // Optimized path ends at the best combination of changes the models found
+      opt6m: Math.min(100, swasthScore + whatIf.best_combination.score_gain / 2),
+      opt12m: Math.min(100, swasthScore + whatIf.best_combination.score_gain)
+    } : {
       current: swasthScore,
       base6m: swasthScore - 4, 
       base12m: swasthScore - 10,
@@ -203,7 +218,12 @@ const DashboardPage = () => {
     userExplanation: aiData?.trajectory_explanation || "Analyzing trajectory..."
   };
 
-  const mockLeverageData = {
+  const bestChange = whatIf?.best_single_change;
+  const mockLeverageData = bestChange && bestChange.score_gain > 0 ? {
+    action: bestChange.action,
+    scoreImpact: bestChange.score_gain,
+    secondaryImpact: `All tested changes combined: +${whatIf.best_combination.score_gain} pts`
+  } : {
     action: aiData?.leverage_recommendation?.action || "Analyzing highest impact action...",
     scoreImpact: aiData?.leverage_recommendation?.scoreImpact || "?",
     secondaryImpact: aiData?.leverage_recommendation?.secondaryImpact || "Calculating benefits..."
@@ -51,7 +51,7 @@ const DeepScanPage = () => {
     setLoading(true);
     try {
       // Call the ML Models backend
-      const result = await submitDeepScan(formData);
+      const result = await submitDeepScan({ ...formData, user_id: user?.id });
       // Save it globally for the Dashboard
       saveScanResults(result);
       navigate('/results');
@@ -4,6 +4,52 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { useNavigate } from 'react-router-dom';
 import { Shield, Activity, X, CheckCircle, Mic, Maximize } from 'lucide-react';
 
+// Binary /ws/vision-scan protocol (little endian), see vision_scan.py
+//   -> version u8 | phase u8 | flags u16 | seq u32 | JPEG
+//   <- version u8 | phase u8 | flags u16 | seq u32 | progress f32 | chest_dist f32 | JPEG
+// With FLAG_LANDMARKS_ONLY the reply carries shoulder coordinates instead of a JPEG
+// and the HUD is drawn here on a canvas. With FLAG_BREATHING a 16 byte block
+// (smoothed_dist, breaths_per_min, expansion_px, confidence f32; NaN = unknown)
+// sits between the header and the rest of the reply.
+const PROTOCOL_VERSION = 1;
+const FRAME_HEADER_SIZE = 8;
+const RESULT_HEADER_SIZE = 16;
+const BREATHING_SIZE = 16;
+const FLAG_LANDMARKS_ONLY = 0x1;
+const FLAG_BREATHING = 0x2;
+const LANDMARKS_ONLY = true;
+
+// Same HUD the backend used to burn into the frame (scaled for the frame size)
+const drawShoulderOverlay = (canvas, { lx, ly, rx, ry, chestDist, width, height }) => {
+  if (!canvas) return;
+  if (canvas.width !== width || canvas.height !== height) {
+    canvas.width = width;
+    canvas.height = height;
+  }
+  const ctx = canvas.getContext('2d');
+  ctx.clearRect(0, 0, width, height);
+  if (lx < 0 || rx < 0) return;
+
+  // The webcam preview is mirrored, so mirror x to line up with it
+  const left = [width - lx, ly];
+  const right = [width - rx, ry];
+  const unit = width / 1920;
+
+  ctx.strokeStyle = ctx.fillStyle = 'rgb(255, 255, 0)';
+  ctx.lineWidth = 8 * unit;
+  ctx.beginPath();
+  ctx.moveTo(...left);
+  ctx.lineTo(...right);
+  ctx.stroke();
+  [left, right].forEach(([x, y]) => {
+    ctx.beginPath();
+    ctx.arc(x, y, 16 * unit, 0, 2 * Math.PI);
+    ctx.fill();
+  });
+  ctx.font = `${Math.round(40 * unit)}px monospace`;
+  ctx.fillText(`SHOULDER_DIST: ${Math.round(chestDist)}px`, Math.min(left[0], right[0]), left[1] - 50 * unit);
+};
+
 const KinematicScanPage = () => {
   const navigate = useNavigate();
   const webcamRef = useRef(null);
@@ -11,6 +57,11 @@ const KinematicScanPage = () => {
   const animationRef = useRef(null);
   const wsRef = useRef(null);
   const isProcessingRef = useRef(false);
+  const seqRef = useRef(0);
+  const frameUrlRef = useRef(null);
+  const overlayRef = useRef(null);
+  // Frame rate / size / quality hints pushed by the server (?pacing=1)
+  const pacingRef = useRef({ fps: 10, maxSide: 1920, quality: 0.6 });
   
   // Tracking
   const [processedFrame, setProcessedFrame] = useState(null);
@@ -25,6 +76,7 @@ const KinematicScanPage = () => {
   }, [phase]);
 
   const [progress, setProgress] = useState(0);
+  const [breathsPerMin, setBreathsPerMin] = useState(null);
   const [scanMessage, setScanMessage] = useState("Initializing Biometric Sensors...");
   
   // Results & Tracking State
@@ -34,7 +86,8 @@ const KinematicScanPage = () => {
   // Initialize WebSockets
   useEffect(() => {
     // Connect to Python WebSocket
-    wsRef.current = new WebSocket("ws://localhost:8000/ws/vision-scan");
+    wsRef.current = new WebSocket("ws://localhost:8000/ws/vision-scan?pacing=1");
+    wsRef.current.binaryType = 'arraybuffer';
     
     wsRef.current.onopen = () => {
         console.log("WebSocket connected.");
@@ -43,7 +96,51 @@ const KinematicScanPage = () => {
     
     wsRef.current.onmessage = (event) => {
         try {
-            const data = JSON.parse(event.data);
+            let data;
+            if (event.data instanceof ArrayBuffer) {
+                const view = new DataView(event.data);
+                const flags = view.getUint16(2, true);
+                data = {
+                    progress: view.getFloat32(8, true),
+                    chest_dist: view.getFloat32(12, true)
+                };
+                let offset = RESULT_HEADER_SIZE;
+                if (flags & FLAG_BREATHING) {
+                    const bpm = view.getFloat32(offset + 4, true);
+                    data.breathing = { breaths_per_min: Number.isNaN(bpm) ? null : bpm };
+                    offset += BREATHING_SIZE;
+                }
+                if (flags & FLAG_LANDMARKS_ONLY) {
+                    drawShoulderOverlay(overlayRef.current, {
+                        lx: view.getFloat32(offset, true),
+                        ly: view.getFloat32(offset + 4, true),
+                        rx: view.getFloat32(offset + 8, true),
+                        ry: view.getFloat32(offset + 12, true),
+                        chestDist: data.chest_dist,
+                        width: view.getUint16(offset + 20, true),
+                        height: view.getUint16(offset + 22, true)
+                    });
+                    isProcessingRef.current = false; // Unlock for next frame!
+                } else {
+                    const jpeg = new Blob([new Uint8Array(event.data, offset)], { type: 'image/jpeg' });
+                    if (frameUrlRef.current) URL.revokeObjectURL(frameUrlRef.current);
+                    frameUrlRef.current = URL.createObjectURL(jpeg);
+                    data.frame = frameUrlRef.current;
+                }
+            } else {
+                data = JSON.parse(event.data);
+                if (data.type === 'pacing') {
+                    pacingRef.current = { fps: data.fps, maxSide: data.max_side, quality: data.jpeg_quality };
+                    return;
+                }
+                if (data.type === 'ack') {
+                    isProcessingRef.current = false; // Backend skipped the frame, credit returned
+                    return;
+                }
+            }
+            if (data.breathing) {
+                setBreathsPerMin(data.breathing.breaths_per_min);
+            }
             if (data.frame) {
                 setProcessedFrame(data.frame);
                 isProcessingRef.current = false; // Unlock for next frame!
@@ -71,6 +168,7 @@ const KinematicScanPage = () => {
     return () => {
       if (wsRef.current) wsRef.current.close();
       if (animationRef.current) cancelAnimationFrame(animationRef.current);
+      if (frameUrlRef.current) URL.revokeObjectURL(frameUrlRef.current);
     }
   }, []);
 
@@ -86,47 +184,54 @@ const KinematicScanPage = () => {
       ) {
         isProcessingRef.current = true; // Lock until backend responds
         
-        // Failsafe: Unlock if backend silently drops the frame (e.g. OpenCV decode error)
+        // Failsafe: the backend acks every frame (even dropped ones), so this only covers a stalled connection
         setTimeout(() => {
            isProcessingRef.current = false;
-        }, 500);
+        }, 3000);
         
         const video = webcamRef.current.video;
         const videoWidth = video.videoWidth;
         const videoHeight = video.videoHeight;
         
-        // Use full HD resolution for maximum presentation quality
-        const scaleFactor = 1.0; 
-        const canvasWidth = videoWidth * scaleFactor;
-        const canvasHeight = videoHeight * scaleFactor;
+        // Send at the resolution the backend asked for (full HD when it has headroom)
+        const { maxSide, quality } = pacingRef.current;
+        const scaleFactor = Math.min(1.0, maxSide / Math.max(videoWidth, videoHeight));
+        const canvasWidth = Math.round(videoWidth * scaleFactor);
+        const canvasHeight = Math.round(videoHeight * scaleFactor);
         
         // Ensure hidden canvas exists
         if (!canvasRef.current) {
-            const canvas = document.createElement('canvas');
-            canvas.width = canvasWidth;
-            canvas.height = canvasHeight;
-            canvasRef.current = canvas;
+            canvasRef.current = document.createElement('canvas');
+        }
+        if (canvasRef.current.width !== canvasWidth || canvasRef.current.height !== canvasHeight) {
+            canvasRef.current.width = canvasWidth;
+            canvasRef.current.height = canvasHeight;
         }
 
         const ctx = canvasRef.current.getContext('2d');
         ctx.drawImage(video, 0, 0, canvasWidth, canvasHeight);
         
-        // Compress moderately for high-quality HD OpenCV drawing (JPEG quality 0.6)
-        const frameData = canvasRef.current.toDataURL('image/jpeg', 0.6);
-        
-        // Send a JSON object with the frame and the active phase
-        const payload = JSON.stringify({
-            frame: frameData,
-            phase: phaseRef.current
-        });
-        
-        wsRef.current.send(payload);
+        // Compress at the backend's requested JPEG quality
+        // and send raw bytes behind a small header instead of a base64 data-URL
+        const phaseAtCapture = phaseRef.current;
+        canvasRef.current.toBlob(async (blob) => {
+            if (!blob || !wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) return;
+            const jpeg = await blob.arrayBuffer();
+            const packet = new Uint8Array(FRAME_HEADER_SIZE + jpeg.byteLength);
+            const view = new DataView(packet.buffer);
+            view.setUint8(0, PROTOCOL_VERSION);
+            view.setUint8(1, phaseAtCapture);
+            view.setUint16(2, LANDMARKS_ONLY ? FLAG_LANDMARKS_ONLY : 0, true);
+            view.setUint32(4, seqRef.current++, true);
+            packet.set(new Uint8Array(jpeg), FRAME_HEADER_SIZE);
+            wsRef.current.send(packet);
+        }, 'image/jpeg', quality);
       }
       
-      // Throttle strictly to 10 FPS (100ms) to prevent buffering lag buildup
+      // Throttle to the backend's requested frame rate to prevent buffering lag buildup
       setTimeout(() => {
           animationRef.current = requestAnimationFrame(streamToBackend);
-      }, 100);
+      }, 1000 / pacingRef.current.fps);
     };
     
     streamToBackend();
@@ -248,6 +353,11 @@ const KinematicScanPage = () => {
         {/* --- HUD OVERLAYS --- */}
         <div className="absolute inset-0 pointer-events-none overflow-hidden">
           
+        <canvas
+            ref={overlayRef}
+            className="absolute inset-0 w-full h-full object-cover z-10"
+        />
+
         {processedFrame && (
             <img 
                 src={processedFrame} 
@@ -290,7 +400,7 @@ const KinematicScanPage = () => {
                   
                   <div className="absolute bottom-24 w-full text-center">
                     <span className="bg-healthcare-teal/20 text-teal-300 px-4 py-1.5 rounded-full text-xs font-bold font-mono border border-teal-500/30 backdrop-blur-md">
-                      TRCK_CHEST_EXPANSION [{Math.round(progress)}%]
+                      TRCK_CHEST_EXPANSION [{Math.round(progress)}%]{breathsPerMin !== null && ` · ${Math.round(breathsPerMin)} BPM`}
                     </span>
                   </div>
               </motion.div>
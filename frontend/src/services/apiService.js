@@ -59,7 +59,8 @@ export const submitDeepScan = async (formData) => {
       pregnancies: 0,
       insulin: 80,
       skin_thickness: 20,
-      diabetes_pedigree: 0.5
+      diabetes_pedigree: 0.5,
+      user_id: formData.user_id || null // lets the backend feed family risk aggregates
     };
     const response = await axios.post(`${API_BASE_URL}/deep_scan`, payload);
     return response.data;
@@ -69,6 +70,20 @@ export const submitDeepScan = async (formData) => {
   }
 };
 
+// Model-computed score impact of lifestyle changes, starting from the user's last Deep Scan
+export const getWhatIf = async (userId, changes = null) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/deep_scan/what-if`, {
+      user_id: userId,
+      changes
+    });
+    return response.data;
+  } catch (error) {
+    console.error("Error in What-If projection:", error);
+    return null;
+  }
+};
+
 export const registerPatient = async (patientData) => {
   try {
     const response = await axios.post(`${API_BASE_URL}/api/register/patient`, patientData);
@@ -132,6 +147,16 @@ export const getConnections = async (doctorId) => {
   }
 };
 
+export const getPanelRisk = async (doctorId, limit = 50) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/api/doctor/${doctorId}/panel-risk?limit=${limit}`);
+    return response.data;
+  } catch (error) {
+    console.error("Error fetching panel risk:", error);
+    throw error;
+  }
+};
+
 export const getPatientConnections = async (patientId) => {
   try {
     const response = await axios.get(`${API_BASE_URL}/api/patient-connections/${patientId}`);
@@ -266,12 +291,28 @@ export const linkFamilyMember = async (userId, relativeId) => {
   }
 };
 
-export const getFamilyTree = async (userId) => {
+export const getFamilyTree = async (userId, depth = 1) => {
   try {
-    const response = await axios.get(`${API_BASE_URL}/api/family/tree/${userId}`);
+    const response = await axios.get(`${API_BASE_URL}/api/family/tree/${userId}?depth=${depth}`);
     return response.data;
   } catch (error) {
     console.error("Error fetching family tree:", error);
     throw error;
   }
-};
\ No newline at end of file
+};
+// -----------------------
+// Recorded Scan API
+// -----------------------
+
+// Fallback for poor connections: upload a recorded clip instead of a live /ws/vision-scan session
+export const uploadRecordedScan = async (videoFile) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/api/vision-scan/recording`, videoFile, {
+      headers: { 'Content-Type': videoFile.type || 'application/octet-stream' }
+    });
+    return response.data;
+  } catch (error) {
+    console.error("Error processing recorded scan:", error);
+    throw error;
+  }
+};
@@ -0,0 +1,367 @@
+"""
+Incremental updates for the risk models from newly labeled outcomes.
+
+Confirmed outcomes go to an append-only store per model (labeled/<model>.csv,
+raw columns as in the training CSV). A fixed one-in-five share of rows, picked
+by a hash of the row, is diverted to labeled/<model>.holdout.csv and never
+trained on.
+
+An update reads only the rows appended since the last published update, grows
+the forest with warm_start by a number of trees proportional to the new rows'
+share of everything the model has seen, and retires as many of the oldest
+trees, so the forest keeps its size. The candidate is scored on the held-out
+rows (the train_*.py test split plus the store's holdout) and published over
+the live artifact only if its ROC AUC does not drop:
+
+    python incremental_training.py append heart clinic_outcomes.csv
+    python incremental_training.py update heart
+    python incremental_training.py status heart
+
+A rejected update leaves the rows unconsumed, so they are retried together
+with whatever arrives next. The server picks up a published artifact (and a
+new MODEL_VERSION) on restart.
+"""
+import argparse
+import copy
+import functools
+import io
+import json
+import math
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+STORE_DIR = "labeled"
+
+# Same preprocessing and split as the matching train_*.py script
+MODELS = {
+    "heart": {"csv": "heart.csv", "sep": ",", "target": "target", "drop": [], "dummies": False,
+              "artifact": "heart_model.pkl"},
+    "diabetes": {"csv": "diabetes.csv", "sep": ",", "target": "Outcome", "drop": [], "dummies": False,
+                 "artifact": "diabetes_model.pkl"},
+    "hypertension": {"csv": "cardio_train.csv", "sep": ";", "target": "cardio", "drop": ["id"], "dummies": False,
+                     "artifact": "hypertension_model.pkl"},
+    "stroke": {"csv": "stroke.csv", "sep": ",", "target": "stroke", "drop": ["id"], "dummies": True,
+               "artifact": "stroke_model.pkl"},
+}
+
+# Rows with crc32 % HOLDOUT_MODULUS == 0 are held out (about 20%, like test_size=0.2)
+HOLDOUT_MODULUS = 5
+
+# Smallest batch worth a new tree; smaller batches wait for more rows
+MIN_NEW_ROWS = 20
+
+# New trees also see this many base training rows per new row, so a small or
+# one-sided batch doesn't produce trees that only know the latest clinic
+REPLAY_RATIO = 1.0
+
+# At most this share of the forest is replaced in one update
+MAX_REPLACED_FRACTION = 0.25
+
+_append_lock = threading.Lock()
+
+
+def store_paths(name):
+    return {
+        "train": os.path.join(STORE_DIR, f"{name}.csv"),
+        "holdout": os.path.join(STORE_DIR, f"{name}.holdout.csv"),
+        "state": os.path.join(STORE_DIR, f"{name}.state.json"),
+    }
+
+
+def raw_columns(name):
+    spec = MODELS[name]
+    return list(pd.read_csv(spec["csv"], sep=spec["sep"], nrows=0).columns)
+
+
+@functools.lru_cache(maxsize=None)
+def column_rules(name):
+    """
+    What a stored row may hold, taken from the training CSV: the categories seen
+    in each text column, and the numeric columns that have missing values there.
+    """
+    spec = MODELS[name]
+    df = pd.read_csv(spec["csv"], sep=spec["sep"]).drop(columns=spec["drop"])
+    categories = {c: frozenset(df[c].dropna()) for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])}
+    nullable = frozenset(c for c in df.columns if c not in categories and df[c].isna().any())
+    return categories, nullable
+
+
+def validate_rows(name, df):
+    """
+    Numeric copy of `df` (already in raw column order), or ValueError naming the
+    first bad value. Nothing is stored unless every row passes: the store is
+    append-only, so one bad row would block every later update.
+    """
+    spec = MODELS[name]
+    categories, nullable = column_rules(name)
+    df = df.copy()
+    for column in df.columns:
+        if column in spec["drop"]:
+            continue
+        values = df[column]
+        missing = values.isna()
+        if missing.any() and column not in nullable:
+            raise ValueError(f"Row {int(missing.to_numpy().argmax())}: '{column}' is missing.")
+        if column in categories:
+            unknown = ~missing & ~values.isin(categories[column])
+            if unknown.any():
+                row = int(unknown.to_numpy().argmax())
+                raise ValueError(f"Row {row}: '{column}' must be one of {', '.join(sorted(categories[column]))};"
+                                 f" got {values.tolist()[row]!r}.")
+            continue
+        try:
+            df[column] = pd.to_numeric(values, errors="raise")
+        except (ValueError, TypeError):
+            bad = ~missing & pd.to_numeric(values, errors="coerce").isna()
+            row = int(bad.to_numpy().argmax())
+            raise ValueError(f"Row {row}: '{column}' must be a number; got {values.tolist()[row]!r}.")
+
+    labels = df[spec["target"]]
+    bad = ~labels.isin([0, 1])
+    if bad.any():
+        row = int(bad.to_numpy().argmax())
+        raise ValueError(f"Row {row}: '{spec['target']}' must be 0 or 1; got {labels.tolist()[row]!r}.")
+    df[spec["target"]] = labels.astype(int)
+    return df
+
+
+def prepare(df, spec, columns=None):
+    """
+    (X, y) from raw rows. With `columns` (a fitted model's feature_names_in_),
+    one-hot columns are aligned to the model instead of being derived from
+    whichever categories happen to be in `df`.
+    """
+    df = df.drop(columns=spec["drop"], errors="ignore")
+    if spec["dummies"]:
+        df = pd.get_dummies(df, drop_first=columns is None)
+    df = df.dropna()
+    X = df.drop(spec["target"], axis=1)
+    y = df[spec["target"]].astype(int)
+    if columns is not None:
+        X = X.reindex(columns=columns, fill_value=0)
+    return X, y
+
+
+def base_split(name):
+    spec = MODELS[name]
+    X, y = prepare(pd.read_csv(spec["csv"], sep=spec["sep"]), spec)
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
+
+# ----------------------------------------------------------------------
+# Append-only store
+# ----------------------------------------------------------------------
+def append_rows(name, rows):
+    """
+    Append labeled rows (a DataFrame or a list of dicts with the training CSV's
+    columns) to the store. Returns (rows for training, rows held out).
+    """
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}'. Choose from {', '.join(MODELS)}.")
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+    columns = raw_columns(name)
+    missing = [c for c in columns if c not in df.columns and c not in MODELS[name]["drop"]]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}.")
+    df = validate_rows(name, df.reindex(columns=columns).reset_index(drop=True))
+
+    lines = df.to_csv(index=False, header=False, lineterminator="\n").splitlines(keepends=True)
+    held = [line for line in lines if zlib.crc32(line.encode()) % HOLDOUT_MODULUS == 0]
+    kept = [line for line in lines if zlib.crc32(line.encode()) % HOLDOUT_MODULUS != 0]
+
+    paths = store_paths(name)
+    os.makedirs(STORE_DIR, exist_ok=True)
+    header = ",".join(columns) + "\n"
+    with _append_lock:
+        for path, block in ((paths["train"], kept), (paths["holdout"], held)):
+            if not block:
+                continue
+            new_file = not os.path.exists(path)
+            # One write per batch, so a concurrent reader sees whole batches or a cut it can detect
+            with open(path, "a", encoding="utf-8") as f:
+                f.write((header if new_file else "") + "".join(block))
+    return len(kept), len(held)
+
+
+def read_store(path, columns, offset=0):
+    """Rows from byte `offset` to the last complete line. Returns (DataFrame, end offset)."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns), offset
+    with open(path, "rb") as f:
+        if offset == 0:
+            # Skip the header line
+            f.readline()
+            offset = f.tell()
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    if end == 0:
+        return pd.DataFrame(columns=columns), offset
+    df = pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns)
+    return df, offset + end
+
+
+def load_state(name):
+    path = store_paths(name)["state"]
+    if not os.path.exists(path):
+        return {"offset": 0, "rows_seen": None, "updates": 0, "history": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_atomic(path, data):
+    # Write beside the target and rename over it: readers see the old file or the new one, never half
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates 0600; keep the mode of the file being replaced
+        os.chmod(tmp, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+# ----------------------------------------------------------------------
+# Update
+# ----------------------------------------------------------------------
+def grow_forest(model, X_new, y_new, n_trees, seed):
+    """A copy of `model` with `n_trees` trees fitted on (X_new, y_new) and the `n_trees` oldest dropped."""
+    candidate = copy.copy(model)
+    candidate.estimators_ = list(model.estimators_)
+    # A fresh seed per update, or the new trees would repeat the previous update's bootstrap draws
+    candidate.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees, random_state=seed)
+    candidate.fit(X_new, y_new)
+    candidate.estimators_ = candidate.estimators_[n_trees:]
+    candidate.set_params(warm_start=False, n_estimators=len(candidate.estimators_))
+    return candidate
+
+
+def update_model(name, tolerance=0.0, dry_run=False):
+    """Fold the store's new rows into the model. Returns a summary dict; TypeError if the artifact is not a forest."""
+    spec = MODELS[name]
+    paths = store_paths(name)
+    state = load_state(name)
+    started = time.perf_counter()
+
+    columns = raw_columns(name)
+    new_rows, end = read_store(paths["train"], columns, state["offset"])
+    with open(spec["artifact"], "rb") as f:
+        model = pickle.load(f)
+    features = list(model.feature_names_in_)
+    X_new, y_new = prepare(new_rows, spec, features)
+
+    if not isinstance(model, RandomForestClassifier):
+        # e.g. a winner published with benchmarks.model_families --allow-non-forest
+        raise TypeError(f"{spec['artifact']} holds a {type(model).__name__}, which has no trees to add or retire;"
+                        f" retrain it as a RandomForestClassifier to take incremental updates")
+
+    summary = {"model": name, "new_rows": len(X_new), "published": False}
+    if len(X_new) < MIN_NEW_ROWS:
+        summary["reason"] = f"{len(X_new)} new rows; waiting for at least {MIN_NEW_ROWS}"
+        return summary
+
+    X_base_train, X_base_test, y_base_train, y_base_test = base_split(name)
+    held_rows, _ = read_store(paths["holdout"], columns)
+    X_held, y_held = prepare(held_rows, spec, features)
+    X_eval = pd.concat([X_base_test.reindex(columns=features, fill_value=0), X_held])
+    y_eval = pd.concat([y_base_test, y_held])
+
+    # Replay a sample of the base training rows next to the new ones (cost stays proportional to the batch)
+    n_replay = min(len(X_base_train), int(len(X_new) * REPLAY_RATIO))
+    replay = X_base_train.sample(n=n_replay, random_state=state["updates"])
+    X_fit = pd.concat([X_new, replay.reindex(columns=features, fill_value=0)])
+    y_fit = pd.concat([y_new, y_base_train.loc[replay.index]])
+    if y_fit.nunique() < 2:
+        summary["reason"] = "new rows and replay sample hold a single outcome"
+        return summary
+
+    # New trees get the batch's share of all rows seen so far
+    rows_seen = state["rows_seen"] or len(X_base_train)
+    forest_size = len(model.estimators_)
+    n_trees = math.ceil(forest_size * len(X_new) / (rows_seen + len(X_new)))
+    n_trees = max(1, min(n_trees, int(forest_size * MAX_REPLACED_FRACTION)))
+
+    fit_started = time.perf_counter()
+    candidate = grow_forest(model, X_fit, y_fit, n_trees, seed=42 + state["updates"] + 1)
+    fit_seconds = time.perf_counter() - fit_started
+
+    old_auc = roc_auc_score(y_eval, model.predict_proba(X_eval)[:, 1])
+    new_auc = roc_auc_score(y_eval, candidate.predict_proba(X_eval)[:, 1])
+    summary.update({
+        "trees_replaced": n_trees,
+        "forest_size": len(candidate.estimators_),
+        "holdout_rows": len(X_eval),
+        "old_auc": round(float(old_auc), 4),
+        "new_auc": round(float(new_auc), 4),
+        "fit_seconds": round(fit_seconds, 3),
+    })
+
+    if new_auc < old_auc - tolerance:
+        summary["reason"] = "AUC regressed; rows stay queued for the next update"
+    elif not dry_run:
+        write_atomic(spec["artifact"], pickle.dumps(candidate))
+        state["offset"] = end
+        state["rows_seen"] = rows_seen + len(X_new)
+        state["updates"] += 1
+        state["history"].append({k: summary[k] for k in ("new_rows", "trees_replaced", "old_auc", "new_auc")}
+                                | {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        write_atomic(paths["state"], json.dumps(state, indent=2).encode())
+        summary["published"] = True
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental risk model updates from labeled outcomes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    append = commands.add_parser("append", help="Add labeled rows from a CSV to the store")
+    append.add_argument("model", choices=list(MODELS))
+    append.add_argument("csv", help="Rows with the training CSV's columns, outcome included")
+    update = commands.add_parser("update", help="Fold new rows into the model")
+    update.add_argument("model", choices=list(MODELS))
+    update.add_argument("--tolerance", type=float, default=0.0, help="Largest AUC drop still published")
+    update.add_argument("--dry-run", action="store_true", help="Score the candidate without publishing it")
+    status = commands.add_parser("status", help="Queued rows and past updates")
+    status.add_argument("model", choices=list(MODELS))
+    args = parser.parse_args()
+
+    if args.command == "append":
+        # Sniff the separator: clinic exports are not always in the training CSV's dialect
+        rows = pd.read_csv(args.csv, sep=None, engine="python")
+        try:
+            kept, held = append_rows(args.model, rows)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"Appended {kept} rows for training and {held} held out to {STORE_DIR}/")
+    elif args.command == "update":
+        try:
+            summary = update_model(args.model, args.tolerance, args.dry_run)
+        except TypeError as e:
+            sys.exit(str(e))
+        print(json.dumps(summary, indent=2))
+    else:
+        state = load_state(args.model)
+        queued, _ = read_store(store_paths(args.model)["train"], raw_columns(args.model), state["offset"])
+        held, _ = read_store(store_paths(args.model)["holdout"], raw_columns(args.model))
+        print(f"{args.model}: {len(queued)} rows queued, {len(held)} held out, {state['updates']} updates published")
+        for entry in state["history"]:
+            print(f"  {entry['timestamp']}  +{entry['new_rows']} rows, {entry['trees_replaced']} trees replaced,"
+                  f" AUC {entry['old_auc']} -> {entry['new_auc']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,48 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import pickle
 import pandas as pd
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from fastapi import Request
+from fastapi import Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 import ollama
 import json
-import cv2
-import cv2
-import base64
 import numpy as np
 import asyncio
+import csv
+import hashlib
+import itertools
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from family_graph import FamilyGraph, DEFAULT_SWASTH_SCORE, MAX_FAMILY_DEPTH
+from telemetry import CONTENT_TYPE, MetricsMiddleware, errors_total, observe_stages, registry, stage_timer
+from vision_scan import (
+    DetectorPool, FramePacer, LatestFrameSlot, ScanSession, StageClock, VISION_WORKERS,
+    ack_message, send_result
+)
+from recorded_scan import RECORDING_MAX_BYTES, create_recording_executor, process_recording
+from incremental_training import MODELS as TRAINABLE_MODELS, append_rows
+from tree_attribution import build_attribution
+
+app = FastAPI()
 
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
+# Vision scanner: bounded worker threads + one PoseTracker (VIDEO-mode detector) per live connection
+vision_executor = ThreadPoolExecutor(max_workers=VISION_WORKERS, thread_name_prefix="vision")
+detector_pool = DetectorPool()
 
-# Initialize PoseLandmarker (Tasks API)
-base_options = python.BaseOptions(model_asset_path='pose_landmarker.task')
-options = vision.PoseLandmarkerOptions(
-    base_options=base_options,
-    output_segmentation_masks=False)
-detector = vision.PoseLandmarker.create_from_options(options)
+# Uploaded scan clips: a process pool of PoseLandmarker workers (started on first upload)
+recording_executor = create_recording_executor()
 
-app = FastAPI()
+# Ollama calls are awaited, so a slow generation never blocks the event loop for other requests
+llm_client = ollama.AsyncClient()
 
 # -----------------------
 # In-Memory DB (Simulated)
@@ -37,7 +54,7 @@ db_connections = {}  # DID -> [PID1, PID2]
 db_messages = []
 db_permissions = {}  # PID -> [DID1, DID2]
 db_appointments = [] # Array of appointment dicts
-db_family_trees = {} # UserID -> [Rel1, Rel2]
+family_graph = FamilyGraph() # Unified ID -> entity index + family links
 
 # Allow CORS for local frontend communication
 app.add_middleware(
@@ -48,7 +65,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency / status / in-flight metrics, scraped at GET /metrics
+app.add_middleware(MetricsMiddleware)
+
 templates = Jinja2Templates(directory="templates")
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus scrape target; rendering is the only cost, and only when scraped
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/ui", response_class=HTMLResponse)
 def get_ui(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -56,11 +83,47 @@ def get_ui(request: Request):
 # -----------------------
 # Load All Models
 # -----------------------
-heart_model = pickle.load(open("heart_model.pkl", "rb"))
-diabetes_model = pickle.load(open("diabetes_model.pkl", "rb"))
-hypertension_model = pickle.load(open("hypertension_model.pkl", "rb"))
-stroke_model = pickle.load(open("stroke_model.pkl", "rb"))
-
+model_digests = []
+
+def load_model(path):
+    # Hash the exact bytes that get unpickled, so the version names the model being served
+    with open(path, "rb") as f:
+        blob = f.read()
+    model_digests.append(hashlib.sha256(blob).hexdigest()[:12])
+    return pickle.loads(blob)
+
+heart_model = load_model("heart_model.pkl")
+diabetes_model = load_model("diabetes_model.pkl")
+hypertension_model = load_model("hypertension_model.pkl")
+stroke_model = load_model("stroke_model.pkl")
+
+# Models are only loaded here, at startup, so this is fixed for the life of the
+# process; a restart that loads re-published artifacts gets a new version. It is
+# part of the cache keys below so that swapping RISK_MODELS in place would also
+# have to bump it, rather than serve results from the old models
+MODEL_VERSION = "-".join(model_digests)
+
+RISK_MODELS = {
+    "heart": heart_model,
+    "diabetes": diabetes_model,
+    "hypertension": hypertension_model,
+    "stroke": stroke_model,
+}
+
+# Path contribution tables for /deep_scan?explain=true: tens of MB for a large
+# forest, so built on the first request that asks, once per model version
+attribution_cache = {}
+attribution_lock = threading.Lock()
+
+def model_attribution(key):
+    """TreePathAttribution for one risk model, or None if it has no trees."""
+    cache_key = (key, MODEL_VERSION)
+    if cache_key not in attribution_cache:
+        with attribution_lock:
+            if cache_key not in attribution_cache:
+                with stage_timer("attribution_build:" + key):
+                    attribution_cache[cache_key] = build_attribution(RISK_MODELS[key])
+    return attribution_cache[cache_key]
 
 # -----------------------
 # Unified Deep Scan Input
@@ -69,8 +132,8 @@ class DeepScanInput(BaseModel):
     # Basic
     age: int
     sex: int
-    height: float
-    weight: float
+    height: float = Field(gt=0)  # cm; BMI divides by it
+    weight: float = Field(gt=0)
 
     # Heart-related
     chest_discomfort: str  # "No", "Mild", "Severe"
@@ -86,6 +149,19 @@ class DeepScanInput(BaseModel):
     skin_thickness: int = 20
     diabetes_pedigree: float = 0.5
 
+    # Optional: attach the resulting score to a registered user's profile
+    user_id: str = None
+
+# -----------------------
+# What-If Projection Input Model
+# -----------------------
+class WhatIfRequest(BaseModel):
+    # Starting point: explicit inputs, or the user's last Deep Scan
+    base: DeepScanInput = None
+    user_id: str = None
+    # Field -> list of deltas to try, e.g. {"weight": [-2, -5, -10]}; defaults to WHAT_IF_DEFAULT_GRID
+    changes: dict[str, list[float]] | None = None
+
 # -----------------------
 # AI Insight Input Model
 # -----------------------
@@ -108,8 +184,8 @@ class PatientRegistration(BaseModel):
     name: str
     age: int
     gender: str
-    height: float
-    weight: float
+    height: float = Field(gt=0)
+    weight: float = Field(gt=0)
     blood_pressure: str = ""
     diseases: list[str] = []
     
@@ -126,8 +202,8 @@ class FitnessRegistration(BaseModel):
     name: str
     age: int = 30
     gender: str = ""
-    height: float = 170.0
-    weight: float = 70.0
+    height: float = Field(170.0, gt=0)
+    weight: float = Field(70.0, gt=0)
     activity_level: str = ""
     goal: str = ""
 
@@ -137,144 +213,314 @@ def home():
     return {"message": "Multi-Disease AI Deep Scan Running"}
 
 def align_features(model, input_df):
-    # Create empty dataframe with training feature names
-    aligned_df = pd.DataFrame(columns=model.feature_names_in_)
-    
-    # Fill available columns
-    for col in input_df.columns:
-        if col in aligned_df.columns:
-            aligned_df[col] = input_df[col]
-    
-    # Fill missing columns with 0
-    aligned_df = aligned_df.fillna(0)
-    
-    return aligned_df
+    # Reorder to the training feature names, filling missing columns with 0
+    return input_df.reindex(columns=model.feature_names_in_, fill_value=0)
+
+def risk_level(prob):
+    return "Low" if prob < 0.3 else "Moderate" if prob < 0.6 else "High"
+
+def chest_pain_code(chest_discomfort):
+    if chest_discomfort == "No":
+        return 3
+    elif chest_discomfort == "Mild":
+        return 1
+    return 0
+
 # -----------------------
-# Deep Scan Endpoint
+# Batched Risk Scoring
 # -----------------------
+def predict_risk_batch(batch, explain=False):
+    """
+    Score a list of DeepScanInput with one predict_proba call per model.
+    With explain=True each disease also gets the per-feature contributions
+    to its probability (base_value + contributions = probability).
+    """
+    if not batch:
+        return []
+    explanations = {}
 
-@app.post("/deep_scan")
-def deep_scan(data: DeepScanInput):
+    def attribute(key, model_input):
+        attribution = model_attribution(key) if explain else None
+        if attribution is not None:
+            with stage_timer("attribution:" + key):
+                explanations[key] = (attribution.bias, attribution.explain_dicts(model_input))
 
     # Calculate BMI
-    bmi = data.weight / ((data.height / 100) ** 2)
+    bmi = np.array([d.weight / ((d.height / 100) ** 2) for d in batch])
 
     # ---------------- HEART ----------------
-    if data.chest_discomfort == "No":
-        cp = 3
-    elif data.chest_discomfort == "Mild":
-        cp = 1
-    else:
-        cp = 0
-
     heart_input = pd.DataFrame([{
-        "age": data.age,
-        "sex": data.sex,
-        "cp": cp,
-        "trestbps": data.resting_bp,
-        "chol": data.cholesterol,
-        "fbs": 1 if data.glucose > 120 else 0,
+        "age": d.age,
+        "sex": d.sex,
+        "cp": chest_pain_code(d.chest_discomfort),
+        "trestbps": d.resting_bp,
+        "chol": d.cholesterol,
+        "fbs": 1 if d.glucose > 120 else 0,
         "restecg": 0,
-        "thalach": data.max_heart_rate,
-        "exang": 1 if data.exercise_pain else 0,
+        "thalach": d.max_heart_rate,
+        "exang": 1 if d.exercise_pain else 0,
         "oldpeak": 1.0,
         "slope": 1,
         "ca": 0,
         "thal": 1
-    }])
-
-    heart_prob = heart_model.predict_proba(heart_input)[0][1]
+    } for d in batch])
 
-    heart_risk = "Low" if heart_prob < 0.3 else "Moderate" if heart_prob < 0.6 else "High"
+    with stage_timer("model:heart"):
+        heart_prob = heart_model.predict_proba(heart_input)[:, 1]
+    attribute("heart", heart_input)
 
     # ---------------- DIABETES ----------------
     diabetes_input = pd.DataFrame([{
-        "Pregnancies": data.pregnancies,
-        "Glucose": data.glucose,
-        "BloodPressure": data.resting_bp,
-        "SkinThickness": data.skin_thickness,
-        "Insulin": data.insulin,
-        "BMI": bmi,
-        "DiabetesPedigreeFunction": data.diabetes_pedigree,
-        "Age": data.age
-    }])
-
-    diabetes_prob = diabetes_model.predict_proba(diabetes_input)[0][1]
-
-    diabetes_risk = "Low" if diabetes_prob < 0.3 else "Moderate" if diabetes_prob < 0.6 else "High"
+        "Pregnancies": d.pregnancies,
+        "Glucose": d.glucose,
+        "BloodPressure": d.resting_bp,
+        "SkinThickness": d.skin_thickness,
+        "Insulin": d.insulin,
+        "BMI": b,
+        "DiabetesPedigreeFunction": d.diabetes_pedigree,
+        "Age": d.age
+    } for d, b in zip(batch, bmi)])
+
+    with stage_timer("model:diabetes"):
+        diabetes_prob = diabetes_model.predict_proba(diabetes_input)[:, 1]
+    attribute("diabetes", diabetes_input)
 
     # ---------------- HYPERTENSION ----------------
     hyper_input = pd.DataFrame([{
-        "age": data.age * 365,  # cardio dataset often stores age in days
-        "gender": data.sex,
-        "height": data.height,
-        "weight": data.weight,
-        "ap_hi": data.resting_bp,
+        "age": d.age * 365,  # cardio dataset often stores age in days
+        "gender": d.sex,
+        "height": d.height,
+        "weight": d.weight,
+        "ap_hi": d.resting_bp,
         "ap_lo": 80,
         "cholesterol": 1,
         "gluc": 1,
         "smoke": 0,
         "alco": 0,
         "active": 1
-    }])
+    } for d in batch])
 
     hyper_input = align_features(hypertension_model, hyper_input)
-    hyper_prob = hypertension_model.predict_proba(hyper_input)[0][1]
-
-    hyper_risk = "Low" if hyper_prob < 0.3 else "Moderate" if hyper_prob < 0.6 else "High"
+    with stage_timer("model:hypertension"):
+        hyper_prob = hypertension_model.predict_proba(hyper_input)[:, 1]
+    attribute("hypertension", hyper_input)
 
     # ---------------- STROKE ----------------
     stroke_input = pd.DataFrame([{
-        "age": data.age,
-        "hypertension": 1 if hyper_prob > 0.5 else 0,
-        "heart_disease": 1 if heart_prob > 0.5 else 0,
-        "avg_glucose_level": data.glucose,
-        "bmi": bmi,
+        "age": d.age,
+        "hypertension": 1 if hp > 0.5 else 0,
+        "heart_disease": 1 if cp > 0.5 else 0,
+        "avg_glucose_level": d.glucose,
+        "bmi": b,
         "ever_married_Yes": 1,
         "work_type_Private": 1,
         "Residence_type_Urban": 1,
         "smoking_status_never smoked": 1
-    }])
+    } for d, b, hp, cp in zip(batch, bmi, hyper_prob, heart_prob)])
 
     stroke_input = align_features(stroke_model, stroke_input)
-    stroke_prob = stroke_model.predict_proba(stroke_input)[0][1]
-
-    stroke_risk = "Low" if stroke_prob < 0.3 else "Moderate" if stroke_prob < 0.6 else "High"
+    with stage_timer("model:stroke"):
+        stroke_prob = stroke_model.predict_proba(stroke_input)[:, 1]
+    attribute("stroke", stroke_input)
 
     # ---------------- SWASTH SCORE ----------------
     overall_risk = (heart_prob + diabetes_prob + hyper_prob + stroke_prob) / 4
-    swasth_score = round(100 - (overall_risk * 100), 1)
-    # Emergency alert logic
-    emergency_alert = None
-
-    if (
-      heart_prob > 0.65
-      or stroke_prob > 0.55
-      or hyper_prob > 0.7
-      or swasth_score < 50
-    ):
-      emergency_alert = "⚠ High health risk detected. Immediate medical consultation recommended."
-    
+
+    results = []
+    for i in range(len(batch)):
+        swasth_score = round(100 - (overall_risk[i] * 100), 1)
+        # Emergency alert logic
+        emergency_alert = None
+
+        if (
+          heart_prob[i] > 0.65
+          or stroke_prob[i] > 0.55
+          or hyper_prob[i] > 0.7
+          or swasth_score < 50
+        ):
+          emergency_alert = "⚠ High health risk detected. Immediate medical consultation recommended."
+
+        result = {
+            "heart": {
+                "probability": round(float(heart_prob[i]), 3),
+                "risk_level": risk_level(heart_prob[i])
+            },
+            "diabetes": {
+                "probability": round(float(diabetes_prob[i]), 3),
+                "risk_level": risk_level(diabetes_prob[i])
+            },
+            "hypertension": {
+                "probability": round(float(hyper_prob[i]), 3),
+                "risk_level": risk_level(hyper_prob[i])
+            },
+            "stroke": {
+                "probability": round(float(stroke_prob[i]), 3),
+                "risk_level": risk_level(stroke_prob[i])
+            },
+            "overall_swasth_score": float(swasth_score),
+            "emergency_alert": emergency_alert
+        }
+        for key, (base_value, contributions) in explanations.items():
+            result[key]["base_value"] = round(base_value, 4)
+            result[key]["contributions"] = contributions[i]
+        results.append(result)
+
+    return results
+
+def record_user_score(user_id, result, scan_input=None):
+    # Persist the score so family aggregates see real values instead of placeholders
+    entity = family_graph.get_entity(user_id)
+    if entity is None:
+        return
+    entity["record"]["swasth_score"] = result["overall_swasth_score"]
+    if scan_input is not None:
+        # Latest measured vitals, reused by the doctor panel analytics
+        entity["record"]["scan_input"] = scan_input.dict(exclude={"user_id"})
+    high_risk = [
+        name for name, key in (
+            ("Heart Disease", "heart"),
+            ("Diabetes", "diabetes"),
+            ("Hypertension", "hypertension"),
+            ("Stroke", "stroke"),
+        ) if result[key]["risk_level"] == "High"
+    ]
+    family_graph.update_health(user_id, result["overall_swasth_score"], high_risk)
+
+# -----------------------
+# Deep Scan Endpoint
+# -----------------------
+
+@app.post("/deep_scan")
+def deep_scan(data: DeepScanInput, explain: bool = False):
+    if explain:
+        # Tree-path attribution needs a forest; e.g. a gradient boosting artifact has none
+        unsupported = [key for key in RISK_MODELS if model_attribution(key) is None]
+        if unsupported:
+            raise HTTPException(status_code=409, detail=f"Attribution needs a tree ensemble; not available for: {', '.join(unsupported)}.")
+    result = predict_risk_batch([data], explain)[0]
+
+    if data.user_id:
+        record_user_score(data.user_id, result, data)
+
+    return result
+
+# -----------------------
+# What-If Projection
+# -----------------------
+# Modifiable inputs: (lowest, highest) plausible value, unit, label for the recommendation text
+WHAT_IF_FIELDS = {
+    "weight": (30.0, 250.0, "kg", "body weight"),
+    "resting_bp": (70, 250, "mmHg", "resting blood pressure"),
+    "glucose": (50, 400, "mg/dL", "fasting glucose"),
+    "cholesterol": (100, 600, "mg/dL", "cholesterol"),
+    "max_heart_rate": (60, 220, "bpm", "max heart rate"),
+    "insulin": (0, 900, "uU/mL", "insulin"),
+}
+WHAT_IF_DEFAULT_GRID = {
+    "weight": [-2, -5, -10],
+    "resting_bp": [-5, -10],
+    "glucose": [-10, -20, -40],
+    "cholesterol": [-20, -40],
+}
+WHAT_IF_MAX_SCENARIOS = 5000
+
+def what_if_action(field, delta):
+    low, high, unit, label = WHAT_IF_FIELDS[field]
+    verb = "Lower" if delta < 0 else "Raise"
+    return f"{verb} {label} by {abs(delta):g} {unit}"
+
+def what_if_axis(base, field, deltas):
+    """
+    0 followed by the deltas as they apply to `base`: whole units for int inputs,
+    and cut short at the plausible range in the direction of the change only (an
+    input already outside the range is never moved toward it). Duplicates and
+    changes that end up as 0 are dropped.
+    """
+    low, high = WHAT_IF_FIELDS[field][:2]
+    current = getattr(base, field)
+    applied = set()
+    for delta in deltas:
+        delta = round(delta) if isinstance(current, int) else float(delta)
+        if delta < 0:
+            delta = max(delta, min(0, low - current))
+        else:
+            delta = min(delta, max(0, high - current))
+        if delta:
+            applied.add(delta)
+    return [0] + sorted(applied, key=abs)
+
+def what_if_change(field, delta, result, baseline_score):
+    return {
+        "field": field,
+        "delta": delta,
+        "action": what_if_action(field, delta),
+        "overall_swasth_score": result["overall_swasth_score"],
+        "score_gain": round(result["overall_swasth_score"] - baseline_score, 1),
+    }
+
+@app.post("/deep_scan/what-if")
+def deep_scan_what_if(req: WhatIfRequest):
+    base = req.base
+    if base is None and req.user_id:
+        entity = family_graph.get_entity(req.user_id)
+        if entity and "scan_input" in entity["record"]:
+            base = DeepScanInput(**entity["record"]["scan_input"])
+    if base is None:
+        raise HTTPException(status_code=400, detail="Provide base inputs or a user_id with a completed Deep Scan.")
+
+    grid = req.changes or WHAT_IF_DEFAULT_GRID
+    unknown = [f for f in grid if f not in WHAT_IF_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot vary: {', '.join(unknown)}. Choose from {', '.join(WHAT_IF_FIELDS)}.")
+    if not all(np.isfinite(grid[f]).all() for f in grid):
+        raise HTTPException(status_code=400, detail="Changes must be finite numbers.")
+
+    # Every axis includes "no change", so the grid also holds the unmodified baseline and every
+    # single change. Axes hold the applied deltas, which is what the response reports
+    fields = list(grid)
+    axes = [what_if_axis(base, f, grid[f]) for f in fields]
+    shape = tuple(len(a) for a in axes)
+    n_scenarios = int(np.prod(shape))
+    if n_scenarios > WHAT_IF_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"{n_scenarios} scenarios requested; the limit is {WHAT_IF_MAX_SCENARIOS}.")
+
+    scenarios = []
+    for deltas in itertools.product(*axes):
+        update = {field: getattr(base, field) + delta for field, delta in zip(fields, deltas) if delta}
+        scenarios.append(base.copy(update=update))
+
+    # One predict_proba per model for the whole grid
+    results = predict_risk_batch(scenarios)
+    scores = np.array([r["overall_swasth_score"] for r in results])
+    baseline = results[0]
+    baseline_score = baseline["overall_swasth_score"]
+
+    # itertools.product is row-major, so grid coordinates map to result rows like a C array.
+    # Single changes sit where every other axis is at index 0.
+    single_changes = []
+    for k, (field, axis) in enumerate(zip(fields, axes)):
+        for i, delta in enumerate(axis[1:], start=1):
+            row = np.ravel_multi_index(tuple(i if j == k else 0 for j in range(len(axes))), shape)
+            single_changes.append(what_if_change(field, delta, results[row], baseline_score))
+    single_changes.sort(key=lambda c: c["score_gain"], reverse=True)
+
+    best = int(np.argmax(scores))
+    best_deltas = {f: axis[i] for f, axis, i in zip(fields, axes, np.unravel_index(best, shape))}
 
     return {
-        "heart": {
-            "probability": round(float(heart_prob), 3),
-            "risk_level": heart_risk
-        },
-        "diabetes": {
-            "probability": round(float(diabetes_prob), 3),
-            "risk_level": diabetes_risk
+        "baseline": baseline,
+        "axes": dict(zip(fields, axes)),
+        "scenarios": n_scenarios,
+        # Nested lists indexed like the axes: surface[i][j]... = score with axes[0][i], axes[1][j], ...
+        "surface": scores.reshape(shape).tolist(),
+        "best_single_change": single_changes[0] if single_changes else None,
+        "single_changes": single_changes,
+        "best_combination": {
+            "changes": {f: d for f, d in best_deltas.items() if d},
+            "overall_swasth_score": float(scores[best]),
+            "score_gain": round(float(scores[best]) - baseline_score, 1),
+            "result": results[best],
         },
-        "hypertension": {
-            "probability": round(float(hyper_prob), 3),
-            "risk_level": hyper_risk
-        },
-        "stroke": {
-            "probability": round(float(stroke_prob), 3),
-            "risk_level": stroke_risk
-        },
-        "overall_swasth_score": swasth_score,
-        "emergency_alert": emergency_alert
     }
 
 # -----------------------
@@ -307,18 +553,20 @@ async def generate_insight(request: InsightRequest):
         sys_prompt += f"\nThe user says: '{request.chat_prompt}'. Reply directly to them in the 'twin_message' field."
 
     try:
-        response = ollama.chat(model='llama3.1:8b', format='json', messages=[
-            {
-                'role': 'system',
-                'content': sys_prompt
-            }
-        ])
+        with stage_timer("llm:ai_insight"):
+            response = await llm_client.chat(model='llama3.1:8b', format='json', messages=[
+                {
+                    'role': 'system',
+                    'content': sys_prompt
+                }
+            ])
         
         data = json.loads(response['message']['content'])
         return data
         
     except Exception as e:
         print(f"Ollama Error: {e}")
+        errors_total.inc(("llm:ai_insight",))
         return {
              "twin_message": "I encountered an error trying to process your biological data.",
              "trajectory_explanation": "Error analyzing trajectory.",
@@ -342,18 +590,20 @@ async def quick_scan_triage(request: QuickScanRequest):
     """
     
     try:
-        response = ollama.chat(model='llama3.1:8b', format='json', messages=[
-            {
-                'role': 'system',
-                'content': sys_prompt
-            }
-        ])
+        with stage_timer("llm:quick_scan"):
+            response = await llm_client.chat(model='llama3.1:8b', format='json', messages=[
+                {
+                    'role': 'system',
+                    'content': sys_prompt
+                }
+            ])
         
         data = json.loads(response['message']['content'])
         return data
         
     except Exception as e:
         print(f"Ollama Quick Scan Error: {e}")
+        errors_total.inc(("llm:quick_scan",))
         return {
             "isEmergency": False,
             "text": "System error analyzing symptoms.",
@@ -367,17 +617,24 @@ async def quick_scan_triage(request: QuickScanRequest):
 # Doctor & Patient Registration APIs
 # -----------------------
 
+def generate_short_id(prefix, table):
+    # 8 hex chars like the first uuid4 group, retried on the (rare) collision
+    while True:
+        short_id = f"{prefix}-{secrets.token_hex(4).upper()}"
+        if short_id not in table:
+            return short_id
+
 @app.post("/api/register/patient")
 def register_patient(patient: PatientRegistration):
     # Generate unique PID
-    short_uuid = str(uuid.uuid4()).split("-")[0].upper()
-    pid = f"PID-{short_uuid}"
+    pid = generate_short_id("PID", db_patients)
     
     patient_data = patient.dict()
     patient_data["id"] = pid
     
     # Store in mock DB
     db_patients[pid] = patient_data
+    family_graph.register_entity(pid, "Patient", patient_data)
     
     return {"status": "success", "id": pid, "data": patient_data}
 
@@ -385,31 +642,228 @@ def register_patient(patient: PatientRegistration):
 @app.post("/api/register/doctor")
 def register_doctor(doctor: DoctorRegistration):
     # Generate unique DID
-    short_uuid = str(uuid.uuid4()).split("-")[0].upper()
-    did = f"DID-{short_uuid}"
+    did = generate_short_id("DID", db_doctors)
     
     doctor_data = doctor.dict()
     doctor_data["id"] = did
     
     # Store in mock DB
     db_doctors[did] = doctor_data
+    family_graph.register_entity(did, "Doctor", doctor_data)
     
     return {"status": "success", "id": did, "data": doctor_data}
 
 @app.post("/api/register/fitness")
 def register_fitness(fitness: FitnessRegistration):
     # Generate unique FID (Fitness ID)
-    short_uuid = str(uuid.uuid4()).split("-")[0].upper()
-    fid = f"FID-{short_uuid}"
+    fid = generate_short_id("FID", db_fitness)
     
     fitness_data = fitness.dict()
     fitness_data["id"] = fid
     
     # Store in mock DB
     db_fitness[fid] = fitness_data
+    family_graph.register_entity(fid, "Fitness", fitness_data)
     
     return {"status": "success", "id": fid, "data": fitness_data}
 
+# -----------------------
+# Bulk Onboarding API (NDJSON / CSV streaming)
+# -----------------------
+BULK_KINDS = {
+    "patient": (PatientRegistration, "PID", db_patients, "Patient"),
+    "doctor": (DoctorRegistration, "DID", db_doctors, "Doctor"),
+    "fitness": (FitnessRegistration, "FID", db_fitness, "Fitness"),
+}
+BULK_LIST_FIELDS = ("diseases", "can_cure")  # "|"-separated in CSV cells
+BULK_SCAN_BATCH = 256
+BULK_MAX_LINE_BYTES = 1024 * 1024  # Longer lines (or quoted CSV records) are reported and skipped
+
+async def iter_body_lines(request):
+    """
+    Raw body lines (bytes, without the newline). A line over BULK_MAX_LINE_BYTES
+    comes out as None and is discarded up to its newline, so at most one chunk
+    plus one line is ever held, whatever the client sends.
+    """
+    pending = bytearray()
+    skipping = False
+    async for chunk in request.stream():
+        searched = len(pending)  # Already known to hold no newline
+        pending += chunk
+        start = 0
+        while (end := pending.find(b"\n", max(start, searched))) >= 0:
+            if skipping:
+                skipping = False
+            elif end - start > BULK_MAX_LINE_BYTES:
+                yield None
+            else:
+                yield bytes(pending[start:end])
+            start = end + 1
+        del pending[:start]
+        if len(pending) > BULK_MAX_LINE_BYTES:
+            if not skipping:
+                yield None
+            skipping = True
+            pending.clear()
+    if pending and not skipping:
+        yield bytes(pending)
+
+async def iter_bulk_rows(request, is_csv):
+    """
+    (row dict, None) per record, or (None, error message) for a record that can't
+    be read (bad UTF-8, bad JSON, oversized). CSV records go through csv.reader,
+    so quoted fields may span lines; the first CSV record is the header.
+    """
+    header = None
+    parts, quotes, size = [], 0, 0  # Physical lines of a CSV record still inside a quoted field
+    async for raw in iter_body_lines(request):
+        if raw is None:
+            parts, quotes, size = [], 0, 0
+            yield None, f"Line longer than {BULK_MAX_LINE_BYTES} bytes."
+            continue
+        try:
+            line = raw.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            parts, quotes, size = [], 0, 0
+            yield None, f"Invalid UTF-8: {e}"
+            continue
+
+        if not is_csv:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, str(e)
+            continue
+
+        parts.append(line.rstrip("\r") + "\n")
+        quotes += line.count('"')
+        size += len(raw)
+        if quotes % 2:
+            # Odd quote count: a quoted field continues on the next line
+            if size > BULK_MAX_LINE_BYTES:
+                parts, quotes, size = [], 0, 0
+                yield None, f"Quoted CSV field longer than {BULK_MAX_LINE_BYTES} bytes."
+            continue
+        record, parts, quotes, size = parts, [], 0, 0
+        if len(record) == 1 and not record[0].strip():
+            continue
+        try:
+            values = next(csv.reader(record))
+        except csv.Error as e:
+            yield None, str(e)
+            continue
+        if header is None:
+            header = values
+            continue
+        yield csv_row(header, values), None
+    if parts:
+        yield None, "Unterminated quoted CSV field at end of body."
+
+def csv_row(header, values):
+    row = {key: value for key, value in zip(header, values) if value != ""}
+    for field in BULK_LIST_FIELDS:
+        if field in row:
+            row[field] = [v.strip() for v in row[field].split("|") if v.strip()]
+    return row
+
+class BodyStreamingResponse(StreamingResponse):
+    # The body generator reads `receive` itself via request.stream(), so skip the
+    # disconnect listener that would otherwise race it for request body messages
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+def bulk_line(obj):
+    return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+async def bulk_import_stream(kind, request, is_csv, scan):
+    model, prefix, table, role = BULK_KINDS[kind]
+    started = time.perf_counter()
+    row_no = 0
+    inserted = 0
+    failed = 0
+    scan_queue = []  # (row_no, id, DeepScanInput)
+
+    async def flush_scans():
+        batch = [item[2] for item in scan_queue]
+        try:
+            results = await run_in_threadpool(predict_risk_batch, batch)
+        except Exception as e:
+            # The rows are already inserted: report their IDs and keep streaming
+            print(f"Bulk Scan Error: {e}")
+            errors_total.inc(("bulk_scan",))
+            lines = [bulk_line({"row": n, "status": "success", "id": entity_id, "deep_scan_errors": str(e)})
+                     for n, entity_id, _ in scan_queue]
+            scan_queue.clear()
+            return b"".join(lines)
+        lines = []
+        for (n, entity_id, scan_input), result in zip(scan_queue, results):
+            record_user_score(entity_id, result, scan_input)
+            lines.append(bulk_line({"row": n, "status": "success", "id": entity_id, "deep_scan": result}))
+        scan_queue.clear()
+        return b"".join(lines)
+
+    async for row, read_error in iter_bulk_rows(request, is_csv):
+        row_no += 1
+        try:
+            if read_error:
+                raise ValueError(read_error)
+            record = model(**row)
+        except (ValueError, TypeError) as e:
+            # ValidationError subclasses ValueError; unreadable records arrive as read_error
+            failed += 1
+            errors = e.errors() if isinstance(e, ValidationError) else str(e)
+            yield bulk_line({"row": row_no, "status": "error", "errors": errors})
+            continue
+
+        entity_id = generate_short_id(prefix, table)
+        entity_data = record.dict()
+        entity_data["id"] = entity_id
+        table[entity_id] = entity_data
+        family_graph.register_entity(entity_id, role, entity_data)
+        inserted += 1
+
+        if not scan:
+            yield bulk_line({"row": row_no, "status": "success", "id": entity_id})
+            continue
+
+        scan_row = dict(row)
+        scan_row.setdefault("sex", 1 if str(row.get("gender", "")).lower().startswith("m") else 0)
+        try:
+            scan_queue.append((row_no, entity_id, DeepScanInput(**scan_row)))
+        except ValidationError as e:
+            yield bulk_line({"row": row_no, "status": "success", "id": entity_id, "deep_scan_errors": e.errors()})
+            continue
+
+        if len(scan_queue) >= BULK_SCAN_BATCH:
+            yield await flush_scans()
+
+    if scan_queue:
+        yield await flush_scans()
+
+    elapsed = time.perf_counter() - started
+    yield bulk_line({"summary": {
+        "rows": row_no,
+        "inserted": inserted,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "records_per_sec": round(row_no / elapsed, 1) if elapsed > 0 else None
+    }})
+
+@app.post("/api/bulk/register/{kind}")
+async def bulk_register(kind: str, request: Request, scan: bool = False):
+    if kind not in BULK_KINDS:
+        raise HTTPException(status_code=404, detail="Unknown registration kind.")
+    if scan and kind != "patient":
+        raise HTTPException(status_code=400, detail="Deep scan is only available for patient imports.")
+
+    is_csv = "csv" in request.headers.get("content-type", "")
+    return BodyStreamingResponse(
+        bulk_import_stream(kind, request, is_csv, scan),
+        media_type="application/x-ndjson"
+    )
+
 # -----------------------
 # Messaging & Connection APIs
 # -----------------------
@@ -494,6 +948,112 @@ async def get_connections(doctor_id: str):
             
     return {"status": "success", "patients": patients_data}
 
+# -----------------------
+# Doctor Panel Risk Analytics
+# -----------------------
+panel_risk_cache = {}  # PID -> (fingerprint, deep scan result)
+
+PANEL_CONDITIONS = ("heart", "diabetes", "hypertension", "stroke")
+PROBABILITY_BINS = np.linspace(0.0, 1.0, 11)
+SCORE_BINS = np.linspace(0.0, 100.0, 11)
+
+def patient_scan_input(patient):
+    # Prefer the last measured vitals; otherwise fall back to the same defaults the Deep Scan UI uses
+    if "scan_input" in patient:
+        return DeepScanInput(**patient["scan_input"])
+
+    systolic = str(patient.get("blood_pressure", "")).split("/")[0].strip()
+    return DeepScanInput(
+        age=patient.get("age", 30),
+        sex=1 if str(patient.get("gender", "")).lower().startswith("m") else 0,
+        height=patient.get("height", 170.0),
+        weight=patient.get("weight", 70.0),
+        chest_discomfort="No",
+        resting_bp=int(systolic) if systolic.isdigit() else 120,
+        cholesterol=200,
+        exercise_pain=False,
+        max_heart_rate=150,
+        glucose=100,
+    )
+
+def patient_fingerprint(patient):
+    # Everything patient_scan_input reads, without paying for model validation
+    if "scan_input" in patient:
+        return tuple(patient["scan_input"].values())
+    return (patient.get("age"), patient.get("gender"), patient.get("height"),
+            patient.get("weight"), patient.get("blood_pressure"))
+
+def histogram(values, bins):
+    counts, edges = np.histogram(values, bins=bins)
+    return {"bins": [round(float(e), 2) for e in edges], "counts": counts.tolist()}
+
+@app.get("/api/doctor/{doctor_id}/panel-risk")
+def get_panel_risk(doctor_id: str, limit: Annotated[int, Query(ge=1)] = 50):
+    if doctor_id not in db_doctors:
+        raise HTTPException(status_code=404, detail="Doctor ID not found.")
+
+    consented = [
+        pid for pid in db_connections.get(doctor_id, [])
+        if pid in db_patients and doctor_id in db_permissions.get(pid, [])
+    ]
+
+    # Only patients whose vitals or the model artifacts changed go through the models
+    stale_ids, stale_inputs = [], []
+    invalid = {}
+    for pid in consented:
+        fingerprint = (MODEL_VERSION, patient_fingerprint(db_patients[pid]))
+        cached = panel_risk_cache.get(pid)
+        if cached is None or cached[0] != fingerprint:
+            try:
+                scan_input = patient_scan_input(db_patients[pid])
+            except ValidationError as e:
+                # e.g. a stored height of 0: flag the profile instead of failing the whole panel
+                invalid[pid] = e.errors()
+                continue
+            stale_ids.append((pid, fingerprint))
+            stale_inputs.append(scan_input)
+
+    for (pid, fingerprint), result in zip(stale_ids, predict_risk_batch(stale_inputs)):
+        panel_risk_cache[pid] = (fingerprint, result)
+
+    results = [(pid, panel_risk_cache[pid][1]) for pid in consented if pid not in invalid]
+    scores = np.array([r["overall_swasth_score"] for _, r in results])
+
+    risks = {}
+    histograms = {}
+    for condition in PANEL_CONDITIONS:
+        probs = np.array([r[condition]["probability"] for _, r in results])
+        order = np.argsort(-probs, kind="stable")[:limit]
+        risks[condition] = [{
+            "id": results[i][0],
+            "name": db_patients[results[i][0]]["name"],
+            "probability": results[i][1][condition]["probability"],
+            "risk_level": results[i][1][condition]["risk_level"]
+        } for i in order]
+        histograms[condition] = histogram(probs, PROBABILITY_BINS)
+
+    order = np.argsort(scores, kind="stable")[:limit]
+    risks["overall"] = [{
+        "id": results[i][0],
+        "name": db_patients[results[i][0]]["name"],
+        "swasth_score": results[i][1]["overall_swasth_score"],
+        "emergency_alert": results[i][1]["emergency_alert"]
+    } for i in order]
+    histograms["swasth_score"] = histogram(scores, SCORE_BINS)
+
+    return {
+        "status": "success",
+        "model_version": MODEL_VERSION,
+        "patients_scored": len(results),
+        "recomputed": len(stale_inputs),
+        "emergency_count": sum(1 for _, r in results if r["emergency_alert"]),
+        "invalid_profiles": [
+            {"id": pid, "name": db_patients[pid]["name"], "errors": errors} for pid, errors in invalid.items()
+        ],
+        "risks": risks,
+        "histograms": histograms
+    }
+
 @app.post("/api/grant-access")
 async def grant_access(req: ConsentRequest):
     if req.patient_id not in db_permissions:
@@ -628,61 +1188,43 @@ async def update_appointment_status(appointment_id: str, req: AppointmentStatusU
 
 @app.post("/api/family/link")
 async def link_family_member(req: FamilyLinkRequest):
-    # Determine if relative exists in any DB
-    relative_exists = (req.relative_id in db_patients) or (req.relative_id in db_fitness) or (req.relative_id in db_doctors)
-    if not relative_exists:
+    # Both ends must exist in some DB
+    if family_graph.get_entity(req.user_id) is None:
+        raise HTTPException(status_code=404, detail="User ID not found.")
+    if family_graph.get_entity(req.relative_id) is None:
         raise HTTPException(status_code=404, detail="Relative ID not found.")
         
-    if req.user_id not in db_family_trees:
-        db_family_trees[req.user_id] = []
-        
-    if req.relative_id in db_family_trees[req.user_id]:
+    if family_graph.has_link(req.user_id, req.relative_id):
         raise HTTPException(status_code=400, detail="Relative is already in your Family Web Tree.")
         
-    db_family_trees[req.user_id].append(req.relative_id)
-    
-    # Bi-directional link
-    if req.relative_id not in db_family_trees:
-        db_family_trees[req.relative_id] = []
-    if req.user_id not in db_family_trees[req.relative_id]:
-        db_family_trees[req.relative_id].append(req.user_id)
+    # Bi-directional link, merges both families' aggregate metrics
+    family_graph.add_link(req.user_id, req.relative_id)
         
     return {"status": "success", "message": "Family member linked successfully"}
 
 @app.get("/api/family/tree/{user_id}")
-async def get_family_tree(user_id: str):
-    if user_id not in db_family_trees:
-        return {"status": "success", "tree": []}
-        
+async def get_family_tree(user_id: str, depth: Annotated[int, Query(ge=1, le=MAX_FAMILY_DEPTH)] = 1):
     tree_nodes = []
-    for rel_id in db_family_trees[user_id]:
-        # Search for relative data
-        rel_data = None
-        role = ""
-        
-        if rel_id in db_patients:
-            rel_data = db_patients[rel_id]
-            role = "Patient"
-        elif rel_id in db_fitness:
-            rel_data = db_fitness[rel_id]
-            role = "Fitness"
-        elif rel_id in db_doctors:
-            rel_data = db_doctors[rel_id]
-            role = "Doctor"
-            
-        if rel_data:
-            # We only expose public metrics for the web tree
-            public_node = {
-                "id": rel_id,
-                "name": rel_data["name"],
-                "role": role,
-                "swasth_score": rel_data.get("swasth_score", 85), # Default if not computed
-                "trajectory_status": rel_data.get("trajectory_status", "Stable"),
-                "biological_age": rel_data.get("age", 30) # approximation if missing
-            }
-            tree_nodes.append(public_node)
+    for rel_id, degree in family_graph.traverse(user_id, depth):
+        entity = family_graph.get_entity(rel_id)
+        if entity is None:
+            continue
+        rel_data = entity["record"]
+
+        # We only expose public metrics for the web tree
+        score = family_graph.score_of(rel_id)
+        public_node = {
+            "id": rel_id,
+            "name": rel_data["name"],
+            "role": entity["role"],
+            "degree": degree,
+            "swasth_score": score if score is not None else DEFAULT_SWASTH_SCORE, # Default if not computed
+            "trajectory_status": rel_data.get("trajectory_status", "Stable"),
+            "biological_age": rel_data.get("age", 30) # approximation if missing
+        }
+        tree_nodes.append(public_node)
             
-    return {"status": "success", "tree": tree_nodes}
+    return {"status": "success", "tree": tree_nodes, "family": family_graph.family_metrics(user_id)}
 
 # -----------------------
 # Doctor Search Engine API
@@ -746,12 +1288,13 @@ async def search_doctors(request: SymptomMatchRequest):
     """
     
     try:
-        response = ollama.chat(model='llama3.1:8b', format='json', messages=[
-            {
-                'role': 'system',
-                'content': sys_prompt
-            }
-        ])
+        with stage_timer("llm:search_doctors"):
+            response = await llm_client.chat(model='llama3.1:8b', format='json', messages=[
+                {
+                    'role': 'system',
+                    'content': sys_prompt
+                }
+            ])
         
         # Parse the JSON object and extract the array
         parsed = json.loads(response['message']['content'])
@@ -777,130 +1320,122 @@ async def search_doctors(request: SymptomMatchRequest):
         
     except Exception as e:
         print(f"Ollama Symptom Search Error: {e}")
+        errors_total.inc(("llm:search_doctors",))
         return {"status": "fallback", "matches": available_doctors}
 
 
 # ----------------------------------------------------------------------
 # WEBSOCKET: CUSTOM OPENCV VISION SCANNER
 # ----------------------------------------------------------------------
+async def receive_frame_data(websocket):
+    # Accept both text (JSON) and binary frames
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message.get("text")
+
+async def pump_frames(websocket, slot):
+    # Receive as fast as the client sends; only the newest unprocessed frame is kept
+    try:
+        while True:
+            slot.put(await receive_frame_data(websocket))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        slot.close()
+
 @app.websocket("/ws/vision-scan")
 async def websocket_vision_scan(websocket: WebSocket):
     await websocket.accept()
-    baseline_dist = 0.0
-    phase_1_started = False
+    slot = LatestFrameSlot()
+    receiver = asyncio.create_task(pump_frames(websocket, slot))
+    loop = asyncio.get_running_loop()
+    
+    # Opt-in flow control: the server tells the client how fast / how big to send
+    pacer = FramePacer() if websocket.query_params.get("pacing") == "1" else None
     
     try:
-        while True:
-            # Drain the websocket queue to get ONLY the most recent frame
-            # This prevents the backend from lagging behind the frontend if React sends frames too fast
-            data = None
-            try:
-                # Keep replacing `data` with the newest frame until the queue is empty
-                while True:
-                    data = await asyncio.wait_for(websocket.receive_text(), timeout=0.01)
-            except asyncio.TimeoutError:
-                pass # Queue is empty, `data` now holds the freshest frame
-            
-            # If no new frame arrived in this tick, yield and wait for one
-            if data is None:
-                data = await websocket.receive_text()
-            
-            # Decode base64 to OpenCV format (numpy array)
-            # data format: {"frame": "data:image/jpeg;base64,...", "phase": 1}
-            try:
-                payload = json.loads(data)
-                frame_data = payload.get("frame", "")
-                current_phase = payload.get("phase", 0)
-            except:
-                continue # Ignore malformed packets
-                
-            # If Phase 1 just triggered, reset the baseline so it's fresh!
-            if current_phase == 1 and not phase_1_started:
-                 baseline_dist = 0.0
-                 phase_1_started = True
-            elif current_phase != 1:
-                 phase_1_started = False
-            
-            encoded_data = frame_data.split(',')[1] if ',' in frame_data else frame_data
-            if not encoded_data:
-                 continue
-                 
-            try:
-                img_data = base64.b64decode(encoded_data)
-                np_arr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-                if frame is None:
-                    continue
-            except Exception as e:
-                print(f"Vision Scan Decode Error: {e}")
-                continue
-
-            # Convert BGR to RGB for MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-            
-            # Detect Pose
-            detection_result = detector.detect(mp_image)
-
-            progress = 0
-            chest_dist = 0
-
-            # Draw Custom Graphics using OpenCV
-            if detection_result.pose_landmarks and len(detection_result.pose_landmarks) > 0:
-                h, w, c = frame.shape
-                # The Tasks API returns a list of poses, each pose is a list of landmarks
-                landmarks = detection_result.pose_landmarks[0]
+        async with detector_pool.checkout(vision_executor) as tracker:
+            session = ScanSession(tracker)
+            if pacer:
+                await websocket.send_json(pacer.settings())
+            while True:
+                data = await slot.get()
+                if data is None:
+                    break
+                started = time.perf_counter()
+                clock = StageClock()
                 
-                # Extract Shoulders (Indices: 11 for Left, 12 for Right according to standard MP Pose topology)
-                l_sh = landmarks[11]
-                r_sh = landmarks[12]
+                # Decode, detect, draw and encode off the event loop; one frame in flight per connection
+                reply = await loop.run_in_executor(vision_executor, session.process_message, data, None, clock)
+                if reply is not None:
+                    await send_result(websocket, reply, clock)
+                    clock.lap("send")
+                elif pacer:
+                    # Return the credit even when the frame was unusable
+                    await websocket.send_json(ack_message(data))
                 
-                # In Tasks API, visibility is often replaced by presence/score, check presence > 0.5
-                if getattr(l_sh, 'presence', 1.0) > 0.5 and getattr(r_sh, 'presence', 1.0) > 0.5:
-                    # Pixel coordinates
-                    l_sh_idx = (int(l_sh.x * w), int(l_sh.y * h))
-                    r_sh_idx = (int(r_sh.x * w), int(r_sh.y * h))
-                    
-                    # Calculate distance
-                    chest_dist = np.linalg.norm(np.array(l_sh_idx) - np.array(r_sh_idx))
+                service_s = time.perf_counter() - started
+                observe_stages("vision:", clock.stages)
+                observe_stages("vision:", {"frame": service_s})
+                if pacer:
+                    update = pacer.record(service_s * 1000)
+                    if update:
+                        await websocket.send_json(update)
                     
-                    if baseline_dist == 0.0 or chest_dist < baseline_dist:
-                        baseline_dist = chest_dist
-                        
-                    # Calculate target expansion (e.g. strict 7% chest expansion required)
-                    if baseline_dist > 0 and current_phase == 1:
-                        expansion = max(0, chest_dist - baseline_dist)
-                        target = baseline_dist * 0.07 
-                        if target > 0:
-                            progress = min(100.0, (expansion / target) * 100.0)
-
-                    # --- DRAW CUSTOM HUD on FULL HD FRAME ---
-                    # 1. Glowing Line between shoulders (Thicker for 1080p)
-                    cv2.line(frame, l_sh_idx, r_sh_idx, (0, 255, 255), 8)
-                    cv2.circle(frame, l_sh_idx, 16, (0, 255, 255), -1)
-                    cv2.circle(frame, r_sh_idx, 16, (0, 255, 255), -1)
-                    
-                    # 2. Text Overlay for Telemetry (Larger font for 1080p)
-                    cv2.putText(
-                        frame, 
-                        f"SHOULDER_DIST: {int(chest_dist)}px", 
-                        (l_sh_idx[0], l_sh_idx[1] - 50), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 255, 255), 3
-                    )
-            
-            # --- Encode FRAME back to Base64 ---
-            _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 60])
-            out_b64 = base64.b64encode(buffer).decode('utf-8')
-            
-            # Send back JSON with image frame and math
-            await websocket.send_json({
-                "frame": "data:image/jpeg;base64," + out_b64,
-                "progress": float(progress),
-                "chest_dist": float(chest_dist)
-            })
-
+        print("Vision Scan Client Disconnected")
     except WebSocketDisconnect:
         print("Vision Scan Client Disconnected")
     except Exception as e:
-        print(f"Vision Scan Error: {e}")
\ No newline at end of file
+        print(f"Vision Scan Error: {e}")
+        errors_total.inc(("vision",))
+    finally:
+        receiver.cancel()
+
+
+# ----------------------------------------------------------------------
+# RECORDED SCAN UPLOAD (for patients who can't hold a live session)
+# ----------------------------------------------------------------------
+# Raw video bytes as the request body (Content-Type: video/mp4, video/webm, ...)
+@app.post("/api/vision-scan/recording")
+async def vision_scan_recording(request: Request):
+    # Spool to disk chunk by chunk: OpenCV needs a file and the clip never sits in memory
+    received = 0
+    with tempfile.NamedTemporaryFile(suffix=".video") as upload:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > RECORDING_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Recording is too large.")
+            upload.write(chunk)
+        upload.flush()
+        if not received:
+            raise HTTPException(status_code=400, detail="Empty recording.")
+
+        result = await run_in_threadpool(process_recording, upload.name, recording_executor)
+
+    if result is None:
+        raise HTTPException(status_code=400, detail="Could not decode the recording.")
+    return {"status": "success", **result}
+
+
+# ----------------------------------------------------------------------
+# LABELED OUTCOMES (folded into the models by incremental_training.py)
+# ----------------------------------------------------------------------
+class OutcomeBatch(BaseModel):
+    # Rows with the training CSV's columns, the confirmed outcome included. Values are
+    # numbers, except the stroke model's text categories (e.g. "smoking_status")
+    rows: list[dict[str, float | str | None]]
+
+@app.post("/api/outcomes/{model_name}")
+def record_outcomes(model_name: str, batch: OutcomeBatch):
+    if model_name not in TRAINABLE_MODELS:
+        raise HTTPException(status_code=404, detail="Unknown model.")
+    if not batch.rows:
+        raise HTTPException(status_code=400, detail="No rows.")
+    try:
+        kept, held = append_rows(model_name, batch.rows)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "queued": kept, "held_out": held}
@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+import vision_scan
+from vision_scan import INFERENCE_MAX_SIDE, ChestExpansion, extract_shoulders
+
+# Pose inference for uploaded clips runs in separate processes (one PoseLandmarker each)
+RECORDING_WORKERS = os.cpu_count() or 4
+
+# Frames per task, and tasks in flight per worker: bounds memory whatever the clip length
+RECORDING_CHUNK_FRAMES = 16
+RECORDING_INFLIGHT_PER_WORKER = 2
+
+# Same ceiling as a live session (PACING_MAX_FPS); extra frames add nothing at breathing rates
+RECORDING_SAMPLE_FPS = 15
+
+RECORDING_MAX_SECONDS = 600
+RECORDING_MAX_BYTES = 200 * 1024 * 1024
+
+
+def create_recording_executor():
+    # spawn, not fork: MediaPipe / OpenCV threads in the server process do not survive a fork
+    return ProcessPoolExecutor(
+        max_workers=RECORDING_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_recording_worker)
+
+
+# ----------------------------------------------------------------------
+# Worker process side
+# ----------------------------------------------------------------------
+_detector = None
+
+
+def init_recording_worker():
+    global _detector
+    # One process per core already; keep OpenCV from oversubscribing inside each
+    cv2.setNumThreads(1)
+    # IMAGE mode: chunks of one clip land on different workers, so no cross-frame tracking
+    options = vision.PoseLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=vision_scan.POSE_MODEL_PATH),
+        output_segmentation_masks=False)
+    _detector = vision.PoseLandmarker.create_from_options(options)
+
+
+def detect_chunk(frames, scale):
+    """
+    Shoulders for a (n, h, w, 3) stack of downscaled BGR frames, in pixels of the
+    original video (divided back by `scale`). One entry per frame, None if not visible.
+    """
+    h, w = frames.shape[1:3]
+    region = (0, 0, w / scale, h / scale)
+    out = []
+    for frame in frames:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = _detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame))
+        out.append(extract_shoulders(result, region))
+    return out
+
+
+# ----------------------------------------------------------------------
+# Server side
+# ----------------------------------------------------------------------
+def read_chunks(cap, step, scale, max_frames):
+    """Yield ([timestamps], frame stack) chunks of every `step`-th frame, downscaled."""
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    index = 0
+    kept = 0
+    times, frames = [], []
+    while kept < max_frames:
+        if index % step:
+            # Skipped frames are only demuxed/decoded, never converted or copied
+            if not cap.grab():
+                break
+            index += 1
+            continue
+        ok, frame = cap.read()
+        if not ok:
+            break
+        t = index / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        index += 1
+        kept += 1
+
+        if scale < 1.0:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_LINEAR)
+        times.append(t)
+        frames.append(frame)
+        if len(frames) == RECORDING_CHUNK_FRAMES:
+            yield times, np.stack(frames)
+            times, frames = [], []
+    if frames:
+        yield times, np.stack(frames)
+
+
+def process_recording(path, executor, workers=RECORDING_WORKERS):
+    """
+    Run a recorded scan clip through the live chest expansion metrics.
+    Returns {"series": [...], "summary": {...}}, or None if the file can't be decoded.
+    """
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0
+        if width <= 0 or height <= 0:
+            return None
+
+        step = max(1, round(fps / RECORDING_SAMPLE_FPS)) if fps > 0 else 1
+        max_frames = int(RECORDING_MAX_SECONDS * fps / step) if fps > 0 else RECORDING_MAX_SECONDS * RECORDING_SAMPLE_FPS
+        scale = min(1.0, INFERENCE_MAX_SIDE / max(width, height))
+
+        # The whole clip is the breathing phase
+        chest = ChestExpansion()
+        series = []
+        tracked = 0
+        last_t = 0.0
+
+        def collect(times, future):
+            nonlocal tracked, last_t
+            for t, shoulders in zip(times, future.result()):
+                progress, chest_dist = chest.update(shoulders, 1, t)
+                tracked += shoulders is not None
+                last_t = t
+                series.append({
+                    "t": round(t, 3),
+                    "chest_dist": float(chest_dist),
+                    "progress": round(float(progress), 1),
+                })
+
+        # Decode on this thread while up to `inflight` chunks are detected in parallel;
+        # results are consumed strictly in submission order so the metrics see the clip in order
+        inflight = max(1, workers * RECORDING_INFLIGHT_PER_WORKER)
+        pending = deque()
+        for times, frames in read_chunks(cap, step, scale, max_frames):
+            if len(pending) >= inflight:
+                collect(*pending.popleft())
+            pending.append((times, executor.submit(detect_chunk, frames, scale)))
+        truncated = cap.grab()
+        while pending:
+            collect(*pending.popleft())
+    finally:
+        cap.release()
+
+    elapsed = time.perf_counter() - started
+    duration = last_t + (step / fps if fps > 0 else 0)
+    max_dist = max((p["chest_dist"] for p in series), default=0.0)
+    baseline = float(chest.baseline_dist)
+    return {
+        "series": series,
+        "summary": {
+            "frames_analyzed": len(series),
+            "frames_tracked": tracked,
+            "frame_size": [width, height],
+            "source_fps": round(fps, 2),
+            "duration_seconds": round(duration, 2),
+            "truncated": truncated,
+            "baseline_dist": baseline,
+            "max_chest_dist": max_dist,
+            "max_expansion_pct": round((max_dist - baseline) / baseline * 100.0, 2) if baseline > 0 else None,
+            "max_progress": max((p["progress"] for p in series), default=0),
+            "breathing": chest.breathing.metrics(),
+            "processing_seconds": round(elapsed, 3),
+            "realtime_factor": round(duration / elapsed, 2) if elapsed > 0 else None,
+        },
+    }
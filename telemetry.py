@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Wide enough for sub-millisecond frame stages and minute-long LLM calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values tuple -> value(s)
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = [(labels, self._copy(value)) for labels, value in self._series.items()]
+        for labels, value in sorted(series):
+            lines.extend(self._render_series(labels, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        # Per-bucket (non-cumulative) counts + sum; cumulated only when scraped
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _copy(self, value):
+        return list(value[0]), value[1]
+
+    def _render_series(self, labels, value):
+        counts, total = value
+        lines = []
+        running = 0
+        for upper, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            le = 'le="%s"' % _number(upper)
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, le)} {running}")
+        label_text = _label_text(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_number(total)}")
+        lines.append(f"{self.name}_count{label_text} {running}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# Backend metrics
+# ----------------------------------------------------------------------
+registry = Registry()
+
+http_requests_in_flight = registry.register(Gauge(
+    "swasth_http_requests_in_flight", "HTTP requests currently being handled."))
+http_request_duration = registry.register(Histogram(
+    "swasth_http_request_duration_seconds", "HTTP request latency until the response is complete.",
+    ("method", "route")))
+http_requests_total = registry.register(Counter(
+    "swasth_http_requests_total", "HTTP requests by response status.", ("method", "route", "status")))
+websocket_sessions_in_flight = registry.register(Gauge(
+    "swasth_websocket_sessions_in_flight", "Open websocket sessions.", ("route",)))
+stage_duration = registry.register(Histogram(
+    "swasth_stage_duration_seconds", "Time spent in one stage of a request (model, LLM call, frame step).",
+    ("stage",)))
+errors_total = registry.register(Counter(
+    "swasth_errors_total", "Errors, including ones answered with a fallback response.", ("source",)))
+
+
+@contextmanager
+def stage_timer(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, (stage,))
+
+
+def observe_stages(prefix, stages):
+    """Record a {stage: seconds} mapping (e.g. StageClock.stages) under prefix + stage."""
+    for stage, seconds in stages.items():
+        stage_duration.observe(seconds, (prefix + stage,))
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering): latency,
+    status and in-flight counts for HTTP, open-session gauge for websockets.
+    Requests are labelled with the matched route template, not the raw path,
+    so IDs in URLs don't create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            # The route is only known once the router has run, which is before
+            # the endpoint can accept: count the session from its accept
+            labels = []
+
+            async def ws_send_wrapper(message):
+                if message["type"] == "websocket.accept" and not labels:
+                    labels.append(getattr(scope.get("route"), "path", "unmatched"))
+                    websocket_sessions_in_flight.inc(tuple(labels))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, ws_send_wrapper)
+            finally:
+                if labels:
+                    websocket_sessions_in_flight.dec(tuple(labels))
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(time.perf_counter() - started, (method, route_path))
+            http_requests_total.inc((method, route_path, str(status[0])))
+            if status[0] >= 500:
+                errors_total.inc(("http",))
@@ -0,0 +1,88 @@
+"""
+Per-feature contributions to a forest's predicted probability, from tree paths.
+
+Along the path from the root to a leaf, each split moves the node's positive
+class probability; that change is credited to the split feature. Summed over
+the path it gives the leaf's probability as root value + per-feature deltas,
+and averaged over the trees it reproduces predict_proba exactly:
+
+    prob = bias + contributions.sum(axis=1)
+
+All path sums are computed once per model, one row per leaf, so explaining a
+prediction is a leaf lookup per tree plus a gather and a sum.
+"""
+import numpy as np
+
+
+class TreePathAttribution:
+
+    def __init__(self, model):
+        self.features = list(model.feature_names_in_)
+        self.trees = [estimator.tree_ for estimator in model.estimators_]
+        n_features = len(self.features)
+
+        node_offsets = []
+        leaf_rows = []
+        tables = []
+        roots = []
+        n_nodes = n_leaves = 0
+        for tree in self.trees:
+            left, right, feature = tree.children_left, tree.children_right, tree.feature
+            value = tree.value[:, 0, :]
+            # Positive class probability per node (counts in older pickles, fractions in newer)
+            prob = value[:, -1] / value.sum(axis=1)
+
+            # Cumulative contribution of every node's path, filled breadth first from the root
+            path = np.zeros((tree.node_count, n_features))
+            frontier = np.array([0])
+            while frontier.size:
+                frontier = frontier[left[frontier] != -1]
+                for children in (left[frontier], right[frontier]):
+                    path[children] = path[frontier]
+                    path[children, feature[frontier]] += prob[children] - prob[frontier]
+                frontier = np.concatenate((left[frontier], right[frontier]))
+
+            is_leaf = left == -1
+            rows = np.full(tree.node_count, -1, dtype=np.int32)
+            rows[is_leaf] = n_leaves + np.arange(is_leaf.sum())
+            tables.append(path[is_leaf].astype(np.float32))
+            leaf_rows.append(rows)
+            node_offsets.append(n_nodes)
+            roots.append(prob[0])
+            n_nodes += tree.node_count
+            n_leaves += int(is_leaf.sum())
+
+        # (total leaves, n_features): one row per leaf of every tree
+        self.table = np.concatenate(tables)
+        # Global node index (tree offset + node id) -> row in self.table
+        self.leaf_rows = np.concatenate(leaf_rows)
+        self.node_offsets = np.array(node_offsets, dtype=np.int64)
+        self.bias = float(np.mean(roots))
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + self.leaf_rows.nbytes
+
+    def explain(self, X):
+        """(n_samples, n_features) contributions for a DataFrame already aligned to the model's features."""
+        # Tree.apply directly: the estimator's apply validates and dispatches to joblib per tree
+        X32 = np.ascontiguousarray(X[self.features].to_numpy(dtype=np.float32))
+        leaves = np.column_stack([tree.apply(X32) for tree in self.trees])
+        rows = self.leaf_rows[leaves + self.node_offsets]
+        return self.table[rows].sum(axis=1, dtype=np.float64) / len(self.trees)
+
+    def explain_dicts(self, X, digits=4):
+        """One {feature: contribution} per row, largest effect first."""
+        out = []
+        for row in self.explain(X):
+            order = np.argsort(-np.abs(row))
+            out.append({self.features[j]: round(float(row[j]), digits) for j in order})
+        return out
+
+
+def build_attribution(model):
+    """TreePathAttribution for a fitted forest classifier, None for models without trees."""
+    estimators = getattr(model, "estimators_", None)
+    if not estimators or not hasattr(estimators[0], "tree_") or not hasattr(model, "feature_names_in_"):
+        return None
+    return TreePathAttribution(model)
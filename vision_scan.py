@@ -0,0 +1,615 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+import time
+from contextlib import asynccontextmanager
+
+import cv2
+import mediapipe as mp
+import numpy as np
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+from breathing import BreathingAnalyzer
+
+POSE_MODEL_PATH = 'pose_landmarker.task'
+
+# Frame work (decode, inference, drawing, encode) runs on these threads; OpenCV and
+# MediaPipe release the GIL, so threads scale across cores without pickling frames
+VISION_WORKERS = os.cpu_count() or 4
+
+# Upper bound on PoseLandmarker instances, i.e. concurrent scanning sessions
+MAX_DETECTORS = 16
+
+# Longest side of the image handed to the pose model (it resizes to 256x256 internally anyway)
+INFERENCE_MAX_SIDE = 384
+
+# Once the shoulders are locked, inference only sees this box around them (in shoulder widths)
+ROI_MARGIN_X = 1.0
+ROI_MARGIN_Y = 1.5
+ROI_MIN_SIDE = 96
+
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+
+# Server-driven pacing (clients connecting with ?pacing=1)
+PACING_MIN_FPS = 1
+PACING_MAX_FPS = 15
+PACING_LADDER = ((1920, 0.7), (1280, 0.6), (960, 0.6), (640, 0.5))  # (max frame side, JPEG quality)
+PACING_EMA_ALPHA = 0.2
+PACING_COOLDOWN_FRAMES = 10
+
+# ----------------------------------------------------------------------
+# /ws/vision-scan wire protocol
+# ----------------------------------------------------------------------
+# JSON mode (legacy clients), one text message per frame:
+#   -> {"frame": "data:image/jpeg;base64,...", "phase": 1}
+#   <- {"frame": "data:image/jpeg;base64,...", "progress": 12.5, "chest_dist": 310.0}
+#
+# Binary mode, one binary message per frame (little endian):
+#   -> version u8 | phase u8 | flags u16 | seq u32 | JPEG bytes
+#   <- version u8 | phase u8 | flags u16 | seq u32 | progress f32 | chest_dist f32 | JPEG bytes
+# The server answers in whichever mode the frame arrived in.
+#
+# Landmark-only mode (opt-in per frame: flags bit FLAG_LANDMARKS_ONLY, or
+# "landmarks_only": true in JSON) skips the HUD and cv2.imencode entirely:
+#   <- {"progress", "chest_dist", "baseline", "shoulders": {"left": [x, y], "right": [x, y]} | null,
+#       "frame_size": [w, h]}
+#   <- result header (flags echoed) | left x, y, right x, y, baseline f32 | width, height u16
+# Shoulder coordinates are full-resolution pixels of the received frame; -1 when not visible.
+#
+# Every reply also carries the running breathing analysis (see breathing.py):
+#   <- JSON: "breathing": {"smoothed_dist", "breaths_per_min", "expansion_px", "expansion_pct",
+#                          "confidence", "window_seconds"}   (null fields until enough signal)
+#   <- binary: flags bit FLAG_BREATHING, then smoothed_dist, breaths_per_min, expansion_px,
+#      confidence f32 (NaN when unknown) between the result header and the rest of the reply
+PROTOCOL_VERSION = 1
+FRAME_HEADER = struct.Struct("<BBHI")
+RESULT_HEADER = struct.Struct("<BBHIff")
+BREATHING_PAYLOAD = struct.Struct("<4f")
+LANDMARKS_PAYLOAD = struct.Struct("<5fHH")
+FLAG_LANDMARKS_ONLY = 0x1
+FLAG_BREATHING = 0x2
+
+
+# ----------------------------------------------------------------------
+# Per-frame stage timing
+# ----------------------------------------------------------------------
+# Stage names, in pipeline order. JSON frames go through json_parse / b64_decode,
+# binary frames through "parse"; only full replies have overlay / imencode. JSON
+# replies are serialized by send_result, on the event loop ("json_dumps").
+FRAME_STAGES = ("parse", "json_parse", "b64_decode", "imdecode", "resize", "cvtColor",
+                "detect", "metrics", "overlay", "imencode", "b64_encode", "reply", "json_dumps")
+
+
+class StageClock:
+    """Splits one frame's processing time into named stages (seconds per stage)."""
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+class _NoClock:
+    # Default for callers that don't time stages
+    def lap(self, stage):
+        pass
+
+
+NO_CLOCK = _NoClock()
+
+
+def parse_frame_message(data, clock=NO_CLOCK):
+    """
+    Turn one websocket message (bytes or str) into
+    {"binary": bool, "landmarks_only": bool, "phase": int, "seq": int, "jpeg": np.ndarray},
+    or None if malformed.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        if len(data) <= FRAME_HEADER.size:
+            return None
+        version, phase, flags, seq = FRAME_HEADER.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            return None
+        clock.lap("parse")
+        return {
+            "binary": True,
+            "landmarks_only": bool(flags & FLAG_LANDMARKS_ONLY),
+            "phase": phase,
+            "seq": seq,
+            # Zero-copy view over the JPEG payload, straight into cv2.imdecode
+            "jpeg": np.frombuffer(data, np.uint8, offset=FRAME_HEADER.size),
+        }
+
+    try:
+        payload = json.loads(data)
+        frame_data = payload.get("frame", "")
+        current_phase = payload.get("phase", 0)
+    except (ValueError, AttributeError):
+        return None
+    clock.lap("json_parse")
+
+    encoded_data = frame_data.split(',')[1] if ',' in frame_data else frame_data
+    if not encoded_data:
+        return None
+    try:
+        img_data = base64.b64decode(encoded_data)
+    except ValueError:
+        return None
+    clock.lap("b64_decode")
+
+    return {
+        "binary": False,
+        "landmarks_only": bool(payload.get("landmarks_only", False)),
+        "phase": current_phase,
+        "seq": payload.get("seq", 0),
+        "jpeg": np.frombuffer(img_data, np.uint8),
+    }
+
+
+def _result_prefix(msg, flags, progress, chest_dist, breathing):
+    # Binary result header, followed by the breathing block when there is one
+    if breathing is None:
+        return RESULT_HEADER.pack(PROTOCOL_VERSION, msg["phase"], flags, msg["seq"],
+                                  float(progress), float(chest_dist))
+    values = [breathing[k] for k in ("smoothed_dist", "breaths_per_min", "expansion_px", "confidence")]
+    return b"".join((
+        RESULT_HEADER.pack(PROTOCOL_VERSION, msg["phase"], flags | FLAG_BREATHING, msg["seq"],
+                           float(progress), float(chest_dist)),
+        BREATHING_PAYLOAD.pack(*(float("nan") if v is None else v for v in values)),
+    ))
+
+
+def encode_result(msg, jpeg, progress, chest_dist, breathing=None, clock=NO_CLOCK):
+    """Build the reply for `msg` in the same mode it arrived in. Returns bytes or a JSON-able dict."""
+    if msg["binary"]:
+        # join() copies the encoder output once, no tobytes() round trip
+        return b"".join((_result_prefix(msg, 0, progress, chest_dist, breathing), jpeg))
+
+    out_b64 = base64.b64encode(jpeg).decode('utf-8')
+    clock.lap("b64_encode")
+    reply = {
+        "frame": "data:image/jpeg;base64," + out_b64,
+        "progress": float(progress),
+        "chest_dist": float(chest_dist)
+    }
+    if breathing is not None:
+        reply["breathing"] = breathing
+    return reply
+
+
+def encode_landmarks(msg, shoulders, progress, chest_dist, baseline, frame_size, breathing=None):
+    """Landmark-only reply: a few dozen bytes instead of a re-encoded frame."""
+    if msg["binary"]:
+        (lx, ly), (rx, ry) = shoulders or ((-1, -1), (-1, -1))
+        return b"".join((
+            _result_prefix(msg, FLAG_LANDMARKS_ONLY, progress, chest_dist, breathing),
+            LANDMARKS_PAYLOAD.pack(lx, ly, rx, ry, float(baseline), *frame_size),
+        ))
+
+    reply = {
+        "progress": float(progress),
+        "chest_dist": float(chest_dist),
+        "baseline": float(baseline),
+        "shoulders": None if shoulders is None else {
+            "left": [round(shoulders[0][0], 1), round(shoulders[0][1], 1)],
+            "right": [round(shoulders[1][0], 1), round(shoulders[1][1], 1)],
+        },
+        "frame_size": list(frame_size)
+    }
+    if breathing is not None:
+        reply["breathing"] = breathing
+    return reply
+
+
+async def send_result(websocket, reply, clock=NO_CLOCK):
+    if isinstance(reply, bytes):
+        await websocket.send_bytes(reply)
+        return
+    # What send_json does, split so serialization is timed apart from the send
+    text = json.dumps(reply, separators=(",", ":"), ensure_ascii=False)
+    clock.lap("json_dumps")
+    await websocket.send_text(text)
+
+
+# ----------------------------------------------------------------------
+# Detector pool
+# ----------------------------------------------------------------------
+def create_detector():
+    # Initialize PoseLandmarker (Tasks API) in VIDEO mode so it tracks between frames
+    base_options = python.BaseOptions(model_asset_path=POSE_MODEL_PATH)
+    options = vision.PoseLandmarkerOptions(
+        base_options=base_options,
+        running_mode=vision.RunningMode.VIDEO,
+        output_segmentation_masks=False)
+    return vision.PoseLandmarker.create_from_options(options)
+
+
+def create_tracker():
+    return PoseTracker(create_detector())
+
+
+def extract_shoulders(detection_result, region):
+    """
+    Shoulder pixels from a PoseLandmarker result. `region` is (x0, y0, w, h) of the
+    image the detector saw, in the coordinates the caller wants back.
+    """
+    if not detection_result.pose_landmarks:
+        return None
+
+    # The Tasks API returns a list of poses, each pose is a list of landmarks
+    landmarks = detection_result.pose_landmarks[0]
+    l_sh = landmarks[LEFT_SHOULDER]
+    r_sh = landmarks[RIGHT_SHOULDER]
+
+    # In Tasks API, visibility is often replaced by presence/score, check presence > 0.5
+    if getattr(l_sh, 'presence', 1.0) <= 0.5 or getattr(r_sh, 'presence', 1.0) <= 0.5:
+        return None
+
+    # Normalized coords are relative to the (cropped) region: map back to the full frame
+    x0, y0, rw, rh = region
+    return (x0 + l_sh.x * rw, y0 + l_sh.y * rh), (x0 + r_sh.x * rw, y0 + r_sh.y * rh)
+
+
+class PoseTracker:
+    """
+    Shoulder tracking on top of one VIDEO-mode PoseLandmarker.
+
+    Inference runs on a downscaled copy of the frame and, once both shoulders are
+    found, on a crop around them. Landmarks are mapped back to full-resolution
+    pixel coordinates, so callers never see the inference geometry.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.last_ts_ms = 0
+        self.roi = None  # (x0, y0, x1, y1) in full-resolution pixels
+        self.roi_shape = None  # (h, w) of the frames self.roi was computed on
+
+    def reset(self):
+        # New session: forget the lock, but keep timestamps monotonic for this detector
+        self.roi = None
+        self.roi_shape = None
+
+    def _timestamp(self):
+        self.last_ts_ms = max(int(time.monotonic() * 1000), self.last_ts_ms + 1)
+        return self.last_ts_ms
+
+    def locate_shoulders(self, frame, clock=NO_CLOCK):
+        """((lx, ly), (rx, ry)) in frame pixels, or None if the shoulders are not visible."""
+        h, w = frame.shape[:2]
+        if self.roi_shape != (h, w):
+            # The client changed resolution: the crop is in the old frame's pixels
+            self.roi = None
+        x0, y0, x1, y1 = self.roi or (0, 0, w, h)
+        region = frame[y0:y1, x0:x1]  # view, no copy
+        if region.size == 0:
+            self.roi = None
+            x0, y0, x1, y1 = 0, 0, w, h
+            region = frame
+            if region.size == 0:
+                return None
+        rh, rw = region.shape[:2]
+
+        scale = INFERENCE_MAX_SIDE / max(rh, rw)
+        if scale < 1.0:
+            region = cv2.resize(region, (max(1, round(rw * scale)), max(1, round(rh * scale))),
+                                interpolation=cv2.INTER_LINEAR)
+        clock.lap("resize")
+
+        # Convert BGR to RGB for MediaPipe (on the small image only)
+        rgb_frame = cv2.cvtColor(region, cv2.COLOR_BGR2RGB)
+        clock.lap("cvtColor")
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        detection_result = self.detector.detect_for_video(mp_image, self._timestamp())
+        clock.lap("detect")
+
+        shoulders = extract_shoulders(detection_result, (x0, y0, rw, rh))
+        if shoulders is None:
+            self.roi = None
+            return None
+        self._update_roi(shoulders[0], shoulders[1], w, h)
+        return shoulders
+
+    def _update_roi(self, left, right, w, h):
+        dist = max(np.hypot(left[0] - right[0], left[1] - right[1]), 1.0)
+        x_min, x_max = min(left[0], right[0]), max(left[0], right[0])
+        y_min, y_max = min(left[1], right[1]), max(left[1], right[1])
+
+        # Keep the crop stable while the shoulders stay well inside it, so the
+        # VIDEO-mode tracker sees a consistent image geometry between frames
+        if self.roi is not None:
+            rx0, ry0, rx1, ry1 = self.roi
+            pad = 0.5 * dist
+            if rx0 + pad <= x_min and x_max <= rx1 - pad and ry0 + pad <= y_min and y_max <= ry1 - pad:
+                return
+
+        half_w = max((x_max - x_min) / 2 + ROI_MARGIN_X * dist, ROI_MIN_SIDE / 2)
+        half_h = max(ROI_MARGIN_Y * dist, ROI_MIN_SIDE / 2)
+        cx, cy = (x_min + x_max) / 2, (y_min + y_max) / 2
+        x0, x1 = _fit_span(cx, half_w, w)
+        y0, y1 = _fit_span(cy, half_h, h)
+        self.roi = (x0, y0, x1, y1)
+        self.roi_shape = (h, w)
+
+
+def _fit_span(center, half, limit):
+    # Shift [center - half, center + half] inside [0, limit] instead of clipping it:
+    # with landmarks at the frame edge, clipping leaves a strip too narrow to re-detect in
+    span = min(2 * half, limit)
+    start = min(max(0.0, center - half), limit - span)
+    return int(start), int(start + span)
+
+
+class DetectorPool:
+    """
+    Lazily grown pool of PoseTrackers (one PoseLandmarker each). A connection checks
+    one out for its whole session, so no two frames ever share a detector concurrently
+    and VIDEO-mode tracking state stays with a single stream.
+    """
+
+    def __init__(self, max_size=MAX_DETECTORS, factory=create_tracker):
+        self.max_size = max_size
+        self.factory = factory
+        self.created = 0
+        self._idle = None
+
+    @asynccontextmanager
+    async def checkout(self, executor=None):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+
+        if self._idle.empty() and self.created < self.max_size:
+            self.created += 1
+            try:
+                detector = await asyncio.get_running_loop().run_in_executor(executor, self.factory)
+            except Exception:
+                self.created -= 1
+                raise
+        else:
+            # Every detector is busy: wait for a session to end
+            detector = await self._idle.get()
+
+        try:
+            yield detector
+        finally:
+            self._idle.put_nowait(detector)
+
+
+# ----------------------------------------------------------------------
+# Per-connection frame slot
+# ----------------------------------------------------------------------
+class LatestFrameSlot:
+    """
+    Holds at most one pending frame. A newer frame replaces the pending one, so the
+    worker always picks up the freshest frame and a connection never has more than
+    one frame queued behind the one in flight.
+    """
+
+    def __init__(self):
+        self.data = None
+        self.closed = False
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def put(self, data):
+        if self.data is not None:
+            self.dropped += 1
+        self.data = data
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        """Next frame, or None once the client is gone."""
+        while self.data is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        data, self.data = self.data, None
+        return data
+
+
+# ----------------------------------------------------------------------
+# Server-driven pacing
+# ----------------------------------------------------------------------
+# Pacing clients get a control message up front and whenever the hints change:
+#   <- {"type": "pacing", "fps": 12, "max_side": 1280, "jpeg_quality": 0.6, "credits": 1}
+# and every frame is acknowledged, either by its reply or, if the server skipped it, by
+#   <- {"type": "ack", "seq": 7, "dropped": true}
+# A client holds one credit: it sends a frame, then waits for that frame's ack
+# before sending the next, no faster than `fps`. No timeout polling on either side.
+class FramePacer:
+    """
+    Turns the measured per-frame service time (worker queue wait + processing)
+    into fps / resolution / JPEG quality hints for the client, so a busy server
+    receives fewer and smaller frames instead of building up latency.
+    """
+
+    def __init__(self, level=1):
+        self.level = level
+        self.ema_ms = None
+        self.fps = PACING_MAX_FPS
+        self.frames_since_change = 0
+
+    def settings(self):
+        max_side, quality = PACING_LADDER[self.level]
+        return {"type": "pacing", "fps": self.fps, "max_side": max_side, "jpeg_quality": quality, "credits": 1}
+
+    def record(self, service_ms):
+        """Feed one frame's service time. Returns new settings if the hints changed, else None."""
+        if self.ema_ms is None:
+            self.ema_ms = service_ms
+        else:
+            self.ema_ms += PACING_EMA_ALPHA * (service_ms - self.ema_ms)
+        self.frames_since_change += 1
+
+        old = (self.fps, self.level)
+        budget_ms = 1000.0 / PACING_MAX_FPS
+
+        # Resolution steps, with a cooldown so the ladder does not oscillate
+        if self.frames_since_change >= PACING_COOLDOWN_FRAMES:
+            if self.ema_ms > budget_ms * 1.2 and self.level < len(PACING_LADDER) - 1:
+                self.level += 1
+            elif self.ema_ms < budget_ms * 0.5 and self.level > 0:
+                self.level -= 1
+
+        # Ask for frames a little slower than the server can finish them
+        self.fps = int(min(PACING_MAX_FPS, max(PACING_MIN_FPS, 900.0 / max(self.ema_ms, 1.0))))
+
+        if (self.fps, self.level) == old:
+            return None
+        if self.level != old[1]:
+            self.frames_since_change = 0
+        return self.settings()
+
+
+def ack_message(data):
+    # Best-effort seq for frames we could not process
+    seq = 0
+    if isinstance(data, (bytes, bytearray)) and len(data) >= FRAME_HEADER.size:
+        seq = FRAME_HEADER.unpack_from(data)[3]
+    return {"type": "ack", "seq": seq, "dropped": True}
+
+
+# ----------------------------------------------------------------------
+# Chest expansion metrics (shared by live sessions and recorded clips)
+# ----------------------------------------------------------------------
+def shoulder_pixels(shoulders):
+    (lx, ly), (rx, ry) = shoulders
+    return (int(lx), int(ly)), (int(rx), int(ry))
+
+
+class ChestExpansion:
+    """Baseline shoulder distance, 7% expansion progress and breathing analysis."""
+
+    def __init__(self):
+        self.baseline_dist = 0.0
+        self.breathing = BreathingAnalyzer()
+
+    def reset(self):
+        self.baseline_dist = 0.0
+        self.breathing.reset()
+
+    def update(self, shoulders, current_phase, timestamp):
+        """Feed one frame's shoulders (or None). Returns (progress, chest_dist)."""
+        progress = 0
+        chest_dist = 0
+        if shoulders is None:
+            return progress, chest_dist
+
+        # Pixel coordinates
+        l_sh_idx, r_sh_idx = shoulder_pixels(shoulders)
+
+        # Calculate distance
+        chest_dist = np.linalg.norm(np.array(l_sh_idx) - np.array(r_sh_idx))
+
+        self.breathing.add(timestamp, chest_dist)
+
+        if self.baseline_dist == 0.0 or chest_dist < self.baseline_dist:
+            self.baseline_dist = chest_dist
+
+        # Calculate target expansion (e.g. strict 7% chest expansion required)
+        if self.baseline_dist > 0 and current_phase == 1:
+            expansion = max(0, chest_dist - self.baseline_dist)
+            target = self.baseline_dist * 0.07
+            if target > 0:
+                progress = min(100.0, (expansion / target) * 100.0)
+        return progress, chest_dist
+
+
+# ----------------------------------------------------------------------
+# Per-connection scan state + frame processing (runs on a worker thread)
+# ----------------------------------------------------------------------
+class ScanSession:
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.tracker.reset()
+        self.chest = ChestExpansion()
+        self.phase_1_started = False
+
+    def process_message(self, data, timestamp=None, clock=NO_CLOCK):
+        """
+        Full pipeline for one raw websocket message. Returns the reply, or None to skip.
+        `timestamp` (seconds) defaults to arrival time; recorded clips pass their own.
+        Pass a StageClock to get the time spent in each FRAME_STAGES step.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        # JSON text frames (base64 data-URL) or binary frames (header + raw JPEG)
+        msg = parse_frame_message(data, clock)
+        if msg is None:
+            return None # Ignore malformed packets
+        current_phase = msg["phase"]
+
+        # If Phase 1 just triggered, reset the baseline so it's fresh!
+        if current_phase == 1 and not self.phase_1_started:
+            self.chest.reset()
+            self.phase_1_started = True
+        elif current_phase != 1:
+            self.phase_1_started = False
+
+        try:
+            frame = cv2.imdecode(msg["jpeg"], cv2.IMREAD_COLOR)
+            clock.lap("imdecode")
+
+            if frame is None:
+                return None
+        except Exception as e:
+            print(f"Vision Scan Decode Error: {e}")
+            return None
+
+        # Detect Pose (downscaled / ROI-cropped, mapped back to full-res pixels)
+        shoulders = self.tracker.locate_shoulders(frame, clock)
+
+        # Chest expansion metrics
+        progress, chest_dist = self.chest.update(shoulders, current_phase, timestamp)
+        breathing = self.chest.breathing.metrics()
+        clock.lap("metrics")
+
+        # The client draws its own overlay: skip the HUD and the JPEG encode
+        if msg["landmarks_only"]:
+            h, w = frame.shape[:2]
+            reply = encode_landmarks(msg, shoulders, progress, chest_dist, self.chest.baseline_dist, (w, h), breathing)
+            clock.lap("reply")
+            return reply
+
+        # Draw Custom Graphics using OpenCV
+        if shoulders is not None:
+            l_sh_idx, r_sh_idx = shoulder_pixels(shoulders)
+
+            # --- DRAW CUSTOM HUD on FULL HD FRAME ---
+            # 1. Glowing Line between shoulders (Thicker for 1080p)
+            cv2.line(frame, l_sh_idx, r_sh_idx, (0, 255, 255), 8)
+            cv2.circle(frame, l_sh_idx, 16, (0, 255, 255), -1)
+            cv2.circle(frame, r_sh_idx, 16, (0, 255, 255), -1)
+
+            # 2. Text Overlay for Telemetry (Larger font for 1080p)
+            cv2.putText(
+                frame,
+                f"SHOULDER_DIST: {int(chest_dist)}px",
+                (l_sh_idx[0], l_sh_idx[1] - 50),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 255, 255), 3
+            )
+
+        # --- Encode FRAME back to JPEG ---
+        clock.lap("overlay")
+        _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 60])
+        clock.lap("imencode")
+
+        # Reply with the image frame and math in the client's protocol mode
+        reply = encode_result(msg, buffer, progress, chest_dist, breathing, clock)
+        clock.lap("reply")
+        return reply